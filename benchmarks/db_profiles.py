@@ -0,0 +1,126 @@
+"""Compare database performance profiles under a mixed read/write load.
+
+Each profile gets a fresh database seeded with users, servers and requests.
+Reader tasks then run the menu queries while writer tasks create and cancel
+requests and log messages, and the script reports throughput, latency
+percentiles and errors per profile.
+
+Usage:
+    python benchmarks/db_profiles.py [--duration 10] [--readers 8] [--writers 4]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the repository root to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db_operations
+from database.db_setup import create_tables, migrate_database
+from database.pool import open_pool, close_pool
+from database.profile import PERFORMANCE_PROFILES
+
+SEED_USERS = 500
+SEED_SERVERS = 20
+SEED_REQUESTS = 200
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+async def seed(users, servers, requests):
+    for user_id in range(1, users + 1):
+        await db_operations.get_or_create_user(user_id, f"user{user_id}")
+    for server_id in range(1, servers + 1):
+        await db_operations.get_or_create_server(server_id, f"server{server_id}")
+    for _ in range(requests):
+        await db_operations.create_chat_request(
+            random.randint(1, users), random.randint(1, servers), "Benchmark topic", None
+        )
+
+async def reader_task(stop_at, latencies, errors, users):
+    while time.perf_counter() < stop_at:
+        user_id = random.randint(1, users)
+        start = time.perf_counter()
+        try:
+            await db_operations.get_user_request(user_id)
+            await db_operations.get_active_chat(user_id)
+            await db_operations.get_pending_requests(exclude_user_id=user_id)
+        except Exception as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - start)
+
+async def writer_task(stop_at, latencies, errors, users, servers):
+    while time.perf_counter() < stop_at:
+        user_id = random.randint(1, users)
+        start = time.perf_counter()
+        try:
+            request = await db_operations.create_chat_request(
+                user_id, random.randint(1, servers), "Benchmark topic", None
+            )
+            await db_operations.save_message(1, user_id, "Benchmark message")
+            await db_operations.cancel_request(request['request_id'])
+        except Exception as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - start)
+
+async def run_profile(name, args):
+    with tempfile.TemporaryDirectory() as directory:
+        await open_pool(Path(directory) / 'benchmark.db', args.pool_size, name)
+        try:
+            await create_tables()
+            await migrate_database()
+            await seed(SEED_USERS, SEED_SERVERS, SEED_REQUESTS)
+
+            read_latencies, write_latencies, errors = [], [], []
+            stop_at = time.perf_counter() + args.duration
+            await asyncio.gather(
+                *[reader_task(stop_at, read_latencies, errors, SEED_USERS) for _ in range(args.readers)],
+                *[writer_task(stop_at, write_latencies, errors, SEED_USERS, SEED_SERVERS)
+                  for _ in range(args.writers)]
+            )
+        finally:
+            await close_pool()
+            # Start the next profile without rows cached from this one
+            db_operations.clear_caches()
+
+    return {
+        'profile': name,
+        'reads_per_s': len(read_latencies) / args.duration,
+        'writes_per_s': len(write_latencies) / args.duration,
+        'read_p50_ms': percentile(read_latencies, 0.50) * 1000,
+        'read_p99_ms': percentile(read_latencies, 0.99) * 1000,
+        'write_p50_ms': percentile(write_latencies, 0.50) * 1000,
+        'write_p99_ms': percentile(write_latencies, 0.99) * 1000,
+        'errors': len(errors)
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds to run each profile")
+    parser.add_argument('--readers', type=int, default=8, help="Concurrent reader tasks")
+    parser.add_argument('--writers', type=int, default=4, help="Concurrent writer tasks")
+    parser.add_argument('--pool-size', type=int, default=4, help="Reader connections in the pool")
+    parser.add_argument('--profiles', nargs='+', default=list(PERFORMANCE_PROFILES),
+                        choices=list(PERFORMANCE_PROFILES), help="Profiles to compare")
+    args = parser.parse_args()
+
+    print(f"{'profile':<10} {'reads/s':>9} {'writes/s':>9} {'read p50':>9} {'read p99':>9} "
+          f"{'write p50':>10} {'write p99':>10} {'errors':>7}")
+    for name in args.profiles:
+        result = await run_profile(name, args)
+        print(f"{result['profile']:<10} {result['reads_per_s']:>9.1f} {result['writes_per_s']:>9.1f} "
+              f"{result['read_p50_ms']:>8.2f}ms {result['read_p99_ms']:>8.2f}ms "
+              f"{result['write_p50_ms']:>9.2f}ms {result['write_p99_ms']:>9.2f}ms {result['errors']:>7}")
+
+if __name__ == '__main__':
+    asyncio.run(main())
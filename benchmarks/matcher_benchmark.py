@@ -0,0 +1,83 @@
+"""Measure topic matching throughput against the number of open requests.
+
+For each queue size the matcher is filled with generated requests, then
+queries with generated topics are matched for a fixed time. The script
+reports matches per second, latency percentiles, time to index the queue
+and the size of the vector matrix.
+
+Usage:
+    python benchmarks/matcher_benchmark.py [--sizes 1000 10000 50000] [--duration 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add the repository root to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.matcher import TopicMatcher, MATCH_VECTOR_DIMS
+
+VOCABULARY = (
+    "python rust golang javascript react kubernetes docker cloud security startup fundraising "
+    "marketing sales design product management career interviews resume leadership remote "
+    "machine learning data science statistics research writing music guitar photography "
+    "travel cooking fitness finance investing crypto gaming unity mobile android ios "
+    "open source mentoring teaching physics biology history languages japanese spanish"
+).split()
+
+def random_topic(words=3):
+    return " ".join(random.sample(VOCABULARY, words))
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+def run_size(size, args):
+    matcher = TopicMatcher(dims=args.dims)
+
+    start = time.perf_counter()
+    for request_id in range(1, size + 1):
+        matcher.add(request_id, random.randint(1, size), random_topic(), random_topic(5))
+    index_seconds = time.perf_counter() - start
+
+    latencies, hits = [], 0
+    stop_at = time.perf_counter() + args.duration
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        matches = matcher.best_matches(random_topic(), exclude_user_id=random.randint(1, size))
+        latencies.append(time.perf_counter() - start)
+        hits += bool(matches)
+
+    return {
+        'size': size,
+        'matches_per_s': len(latencies) / args.duration,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'hit_rate': hits / len(latencies) if latencies else 0.0,
+        'index_s': index_seconds,
+        'matrix_mb': matcher.get_metrics()['matrix_bytes'] / (1024 * 1024)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000],
+                        help="Open request counts to measure")
+    parser.add_argument('--duration', type=float, default=3.0, help="Seconds to run queries for each size")
+    parser.add_argument('--dims', type=int, default=MATCH_VECTOR_DIMS, help="Size of the hashed vectors")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for generated topics")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    print(f"{'requests':>9} {'matches/s':>10} {'p50':>9} {'p99':>9} {'hit rate':>9} {'index':>8} {'matrix':>9}")
+    for size in args.sizes:
+        result = run_size(size, args)
+        print(f"{result['size']:>9} {result['matches_per_s']:>10.1f} {result['p50_ms']:>7.3f}ms "
+              f"{result['p99_ms']:>7.3f}ms {result['hit_rate']:>9.2f} {result['index_s']:>7.2f}s "
+              f"{result['matrix_mb']:>7.2f}MB")
+
+if __name__ == '__main__':
+    main()
@@ -8,9 +8,15 @@ import sys
 # Add the current directory to the path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from database import initialize_database
+# Load environment variables before importing modules that read settings from them
+load_dotenv()
+
+from database import initialize_database, close_database
 from web_server import keep_alive
 from utils.status_updater import StatusUpdater
+from utils.scheduler import OutboundScheduler
+from utils.locks import KeyedLockManager
+from utils.metrics_reporter import MetricsReporter
 
 # Setup logging
 logging.basicConfig(
@@ -19,8 +25,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger('coffee_bot')
 
-# Load environment variables
-load_dotenv()
 TOKEN = os.getenv('DISCORD_TOKEN')
 
 # Define intents
@@ -59,12 +63,21 @@ async def on_ready():
     # Make status updater accessible to cogs
     bot.status_updater = status_updater
     
+    # Restore active chats before serving any messages
+    await bot.message_handler.hydrate()
+    
+    # Finish request message edits left pending by the last shutdown
+    await bot.message_handler.request_messages.restore()
+    
     # Initial status update
     await status_updater.update_status()
     
     # Start periodic status updates
     await status_updater.start_status_updates()
     
+    # Start logging metrics periodically
+    bot.metrics_reporter.start()
+    
     # Sync commands
     await bot.tree.sync()
     logger.info('Synced application commands')
@@ -74,10 +87,27 @@ async def main():
     # Initialize database
     await initialize_database()
     
+    # Route outbound Discord calls through the rate-limit-aware scheduler
+    bot.scheduler = OutboundScheduler()
+    bot.scheduler.start()
+    
+    # Serialize state changes to the same request, user or chat
+    bot.locks = KeyedLockManager()
+    
+    # Log the metrics collected across the bot
+    bot.metrics_reporter = MetricsReporter(bot)
+    
     # Start the bot
-    async with bot:
-        await load_extensions()
-        await bot.start(TOKEN)
+    try:
+        async with bot:
+            await load_extensions()
+            await bot.start(TOKEN)
+    finally:
+        bot.metrics_reporter.stop()
+        await bot.scheduler.stop()
+        
+        # Close database connections on shutdown
+        await close_database()
 
 if __name__ == '__main__':
     # Start web server for Replit hosting
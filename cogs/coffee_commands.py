@@ -3,6 +3,7 @@ from discord import app_commands
 from discord.ext import commands
 import logging
 import asyncio
+import functools
 import sys
 import os
 from datetime import datetime
@@ -14,26 +15,33 @@ from utils import (
     CoffeeChatRequestModal,
     CoffeeChatView,
     RequestListView,
+    AcceptRequestButton,
+    create_accept_view,
     create_request_embed,
     create_stats_embed,
     create_leaderboard_embed
 )
 from database import (
-    get_or_create_user,
-    get_or_create_server,
     create_chat_request,
     get_pending_requests,
+    get_pending_requests_page,
+    get_pending_request_count,
+    get_menu_snapshot,
     get_user_request,
     cancel_request,
-    create_chat,
+    accept_request,
+    ACCEPT_NOT_FOUND,
+    ACCEPT_OWN_REQUEST,
+    ACCEPT_IN_CHAT,
     get_user_stats,
     get_leaderboard,
+    get_user_rank,
     get_active_chat,
     end_chat,
-    update_request_message_info,
-    get_request_by_id,
     update_request_message_info
 )
+from utils.locks import request_key, user_key
+from utils.matcher import TopicMatcher
 
 logger = logging.getLogger('coffee_bot.commands')
 
@@ -42,18 +50,29 @@ class CoffeeCommands(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
+        self.matcher = TopicMatcher()
+        
+        # One handler serves the accept buttons of every request message
+        self.bot.add_dynamic_items(AcceptRequestButton)
         logger.info("CoffeeCommands cog initialized")
     
+    async def cog_load(self):
+        # Index the open requests for Find a Match
+        self.matcher.load(await get_pending_requests())
+    
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(AcceptRequestButton)
+    
     async def update_bot_status(self):
-        """Update the bot's status to reflect available coffee chats."""
+        """Let the status updater know the available coffee chats may have changed."""
         if hasattr(self.bot, 'status_updater') and self.bot.status_updater:
-            await self.bot.status_updater.update_status()
+            self.bot.status_updater.notify()
         else:
             # If status_updater isn't available through the bot, try to get it from the global scope
             try:
                 from bot import status_updater
                 if status_updater:
-                    await status_updater.update_status()
+                    status_updater.notify()
             except (ImportError, NameError):
                 logger.warning("Could not update bot status: status_updater not found")
     
@@ -61,9 +80,10 @@ class CoffeeCommands(commands.Cog):
     class CustomCoffeeChatMainView(CoffeeChatView):
         def __init__(self, request_callback, view_requests_callback, stats_callback, 
                     leaderboard_callback, cancel_callback, end_chat_callback,
-                    has_pending_request, in_active_chat, request_count):
+                    has_pending_request, in_active_chat, request_count, match_callback=None):
             super().__init__(request_callback, view_requests_callback, stats_callback, 
                             leaderboard_callback, cancel_callback, end_chat_callback)
+            self.match_callback = match_callback
             
             # Update the Cross-Server Requests button with count
             for item in self.children[:]:
@@ -114,6 +134,16 @@ class CoffeeCommands(commands.Cog):
                     if isinstance(item, discord.ui.Button) and item.label == "Cancel My Request":
                         self.remove_item(item)
                         break
+                
+                # Offer to pair the user with a similar open request instead
+                if match_callback:
+                    self.add_item(discord.ui.Button(
+                        style=discord.ButtonStyle.success,
+                        label="Find a Match",
+                        emoji="🎯",
+                        custom_id="find_match",
+                        row=0
+                    ))
         
         # Override the view_requests_button method to handle the new button
         async def view_requests_button_callback(self, interaction):
@@ -132,6 +162,10 @@ class CoffeeCommands(commands.Cog):
             except discord.errors.InteractionResponded:
                 # If the interaction has already been responded to, use followup instead
                 await self.end_chat_callback(interaction)
+        
+        # Add find_match_button callback
+        async def find_match_button_callback(self, interaction):
+            await self.match_callback(interaction)
     
     @app_commands.command(
         name="coffee", 
@@ -139,29 +173,17 @@ class CoffeeCommands(commands.Cog):
     )
     async def coffee(self, interaction: discord.Interaction):
         """Main command to open the Coffee Chat menu."""
-        # Create or get user in database
-        await get_or_create_user(
+        # Record the user and server while reading their menu state in one round trip
+        snapshot = await get_menu_snapshot(
             user_id=interaction.user.id,
             username=interaction.user.name,
-            discriminator=interaction.user.discriminator if hasattr(interaction.user, 'discriminator') else None
+            discriminator=interaction.user.discriminator if hasattr(interaction.user, 'discriminator') else None,
+            server_id=interaction.guild.id if interaction.guild else None,
+            server_name=interaction.guild.name if interaction.guild else None
         )
-        
-        # Create or get server in database if in a guild
-        if interaction.guild:
-            await get_or_create_server(
-                server_id=interaction.guild.id,
-                server_name=interaction.guild.name
-            )
-        
-        # Check if user has a pending request
-        existing_request = await get_user_request(interaction.user.id)
-        
-        # Check if user is in an active chat
-        in_active_chat = await self.bot.message_handler.is_in_active_chat(interaction.user.id)
-        
-        # Get the count of pending requests for the button label
-        pending_requests = await get_pending_requests(exclude_user_id=interaction.user.id)
-        request_count = len(pending_requests)
+        existing_request = snapshot['pending_request']
+        in_active_chat = snapshot['in_active_chat']
+        request_count = snapshot['request_count']
         
         # Create main menu view with conditional buttons
         view = self.CustomCoffeeChatMainView(
@@ -173,7 +195,8 @@ class CoffeeCommands(commands.Cog):
             end_chat_callback=self.handle_end_chat_button,
             has_pending_request=existing_request is not None,
             in_active_chat=in_active_chat,
-            request_count=request_count
+            request_count=request_count,
+            match_callback=self.handle_find_match
         )
         
         # Add callbacks for the custom buttons
@@ -182,6 +205,8 @@ class CoffeeCommands(commands.Cog):
                 item.callback = view.view_requests_button_callback
             elif isinstance(item, discord.ui.Button) and item.custom_id == "end_chat":
                 item.callback = view.end_chat_button_callback
+            elif isinstance(item, discord.ui.Button) and item.custom_id == "find_match":
+                item.callback = view.find_match_button_callback
         
         # Send menu
         embed = discord.Embed(
@@ -217,37 +242,40 @@ class CoffeeCommands(commands.Cog):
         
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
     
-    async def handle_request(self, interaction: discord.Interaction):
-        """Handle a user clicking the Request Coffee Chat button."""
+    async def request_blocked_embed(self, interaction: discord.Interaction):
+        """Get an embed explaining why a user can't look for a chat, or None if they can."""
         # Check if user already has a pending request
         existing_request = await get_user_request(interaction.user.id)
         if existing_request:
-            embed = discord.Embed(
+            return discord.Embed(
                 title="Request Already Exists",
                 description="You already have a pending coffee chat request. Please cancel it before creating a new one.",
                 color=discord.Color.red()
             )
-            await interaction.response.edit_message(embed=embed)
-            return
         
         # Check if user is in a guild
         if not interaction.guild:
-            embed = discord.Embed(
+            return discord.Embed(
                 title="Must be in a Server",
                 description="You must be in a server to create a coffee chat request.",
                 color=discord.Color.red()
             )
-            await interaction.response.edit_message(embed=embed)
-            return
         
         # Check if user is already in a chat
         in_chat = await self.bot.message_handler.is_in_active_chat(interaction.user.id)
         if in_chat:
-            embed = discord.Embed(
+            return discord.Embed(
                 title="Already in a Chat",
                 description="You are already in an active coffee chat. Please finish your current chat before creating a new request.",
                 color=discord.Color.red()
             )
+        
+        return None
+    
+    async def handle_request(self, interaction: discord.Interaction):
+        """Handle a user clicking the Request Coffee Chat button."""
+        embed = await self.request_blocked_embed(interaction)
+        if embed:
             await interaction.response.edit_message(embed=embed)
             return
         
@@ -255,8 +283,78 @@ class CoffeeCommands(commands.Cog):
         modal = CoffeeChatRequestModal(self.handle_request_submit)
         await interaction.response.send_modal(modal)
     
+    async def handle_find_match(self, interaction: discord.Interaction):
+        """Handle a user clicking the Find a Match button."""
+        embed = await self.request_blocked_embed(interaction)
+        if embed:
+            await interaction.response.edit_message(embed=embed)
+            return
+        
+        # Ask for the topic the same way as a request
+        modal = CoffeeChatRequestModal(self.handle_match_submit, title="Find a Match")
+        await interaction.response.send_modal(modal)
+    
     async def handle_request_submit(self, interaction: discord.Interaction, topic, description):
         """Handle a user submitting the coffee chat request modal."""
+        # Turn away a second submission while the first is being posted
+        async with self.bot.locks.hold(user_key(interaction.user.id), wait=False) as acquired:
+            if not acquired:
+                await interaction.response.send_message("Your request is already being posted.", ephemeral=True)
+                return
+            
+            # First acknowledge the interaction
+            await interaction.response.defer(ephemeral=True)
+            
+            await self.post_request(interaction, topic, description)
+    
+    async def handle_match_submit(self, interaction: discord.Interaction, topic, description):
+        """Handle a user submitting the Find a Match modal.
+        
+        The most similar open requests are tried best first, and the first
+        one that can still be accepted starts a chat. If none can, the topic
+        is posted as a request for others to accept.
+        """
+        user_id = interaction.user.id
+        
+        # Turn away a second submission while the first is being matched
+        async with self.bot.locks.hold(user_key(user_id), wait=False) as acquired:
+            if not acquired:
+                await interaction.response.send_message("You are already being matched.", ephemeral=True)
+                return
+            
+            await interaction.response.defer(ephemeral=True)
+            
+            for request_id, score in self.matcher.best_matches(f"{topic}\n{description or ''}", exclude_user_id=user_id):
+                # Skip requests someone else is accepting or cancelling right now
+                async with self.bot.locks.hold(request_key(request_id), wait=False) as claimed:
+                    if not claimed:
+                        continue
+                    
+                    result = await self.claim_request(request_id, user_id)
+                    if result.accepted:
+                        logger.info(f"Matched user {user_id} with request {request_id} (score {score:.2f})")
+                        await self.start_accepted_chat(interaction, result, matched=True)
+                        return
+                    
+                    if result.status == ACCEPT_IN_CHAT:
+                        await interaction.followup.send(
+                            "You are already in an active coffee chat. Please end your current chat before finding a new one.",
+                            ephemeral=True
+                        )
+                        return
+            
+            # Nothing similar is open, so let others find this topic instead
+            await self.post_request(interaction, topic, description)
+            await interaction.followup.send(
+                "No similar requests are open right now, so your request has been posted for others to accept.",
+                ephemeral=True
+            )
+    
+    async def post_request(self, interaction: discord.Interaction, topic, description):
+        """Create a request and post it to the interaction's channel.
+        
+        The interaction must already be deferred.
+        """
         # Create request in database
         request = await create_chat_request(
             user_id=interaction.user.id,
@@ -264,54 +362,26 @@ class CoffeeCommands(commands.Cog):
             topic=topic,
             description=description
         )
+        self.matcher.add(request['request_id'], interaction.user.id, topic, description)
         
         # Create embed for request
         embed = create_request_embed(request, interaction.user)
         
         # Create view with accept button
-        class AcceptRequestView(discord.ui.View):
-            def __init__(self, accept_callback, bot):
-                super().__init__(timeout=None)  # No timeout for request buttons
-                self.accept_callback = accept_callback
-                self.bot = bot
-                
-            @discord.ui.button(label="Accept Request", style=discord.ButtonStyle.success, emoji="✅", custom_id=f"accept_request_{request['request_id']}")
-            async def accept_button(self, button_interaction: discord.Interaction, button: discord.ui.Button):
-                # Check if the user is the requester
-                if button_interaction.user.id == request['user_id']:
-                    await button_interaction.response.send_message(
-                        "You cannot accept your own coffee chat request.",
-                        ephemeral=True
-                    )
-                    return
-                
-                # Check if the user is already in a chat
-                user_in_chat = await self.bot.message_handler.is_in_active_chat(button_interaction.user.id)
-                
-                if user_in_chat:
-                    # Just inform the user they're already in a chat
-                    await button_interaction.response.send_message(
-                        "You are already in an active coffee chat. Please finish your current chat before accepting a new one.",
-                        ephemeral=True
-                    )
-                    return
-                
-                # If not in a chat, proceed with the callback
-                await self.accept_callback(button_interaction, request['request_id'])
-        
-        view = AcceptRequestView(self.handle_accept_request, self.bot)
-        
-        # First acknowledge the interaction
-        await interaction.response.defer(ephemeral=True)
+        view = create_accept_view(request['request_id'])
         
         # Send request to channel
         channel = interaction.channel
-        request_message = await channel.send(
-            f"**{interaction.user.display_name}** is looking for a coffee chat!",
+        request_message = await self.bot.scheduler.send(
+            channel,
+            content=f"**{interaction.user.display_name}** is looking for a coffee chat!",
             embed=embed,
             view=view
         )
         
+        # Clicks are handled by the registered AcceptRequestButton, so don't keep the view
+        view.stop()
+        
         # Save the message ID and channel ID for future reference
         await update_request_message_info(request['request_id'], request_message.id, channel.id)
         
@@ -320,10 +390,11 @@ class CoffeeCommands(commands.Cog):
     
     async def handle_view_requests(self, interaction: discord.Interaction):
         """Handle a user clicking the View Requests button."""
-        # Get pending requests excluding the user's own
-        requests = await get_pending_requests(exclude_user_id=interaction.user.id)
+        # Get the first page of pending requests excluding the user's own
+        fetch_page = functools.partial(get_pending_requests_page, exclude_user_id=interaction.user.id)
+        page = await fetch_page()
         
-        if not requests:
+        if not page['requests']:
             # Edit the original message instead of sending a new one
             embed = discord.Embed(
                 title="No Coffee Chat Requests",
@@ -336,15 +407,10 @@ class CoffeeCommands(commands.Cog):
                 await interaction.followup.edit_message(interaction.message.id, embed=embed)
             return
         
-        # Create embed with request info
-        embed = discord.Embed(
-            title=f"Coffee Chat Requests ({len(requests)})",
-            description="Select a request to accept:",
-            color=discord.Color.blue()
-        )
-        
-        # Create view with request select menu
-        view = RequestListView(requests, self.handle_accept_request)
+        # Create view with request select menu and page buttons
+        request_count = await get_pending_request_count(exclude_user_id=interaction.user.id)
+        view = RequestListView(page, fetch_page, self.handle_accept_request, total_count=request_count)
+        embed = view.create_embed()
         
         # Edit the original message
         try:
@@ -354,118 +420,98 @@ class CoffeeCommands(commands.Cog):
     
     async def handle_accept_request(self, interaction: discord.Interaction, request_id):
         """Handle a user accepting a coffee chat request."""
+        # Turn away double clicks and clicks racing another change to the request
+        async with self.bot.locks.hold(request_key(request_id), user_key(interaction.user.id), wait=False) as acquired:
+            if not acquired:
+                await interaction.response.send_message("This request is already being processed.", ephemeral=True)
+                return
+            
+            await self._accept_request(interaction, request_id)
+    
+    async def _accept_request(self, interaction: discord.Interaction, request_id):
         # Immediately defer the response to prevent timeout
         await interaction.response.defer(ephemeral=True)
         
-        # Get the request details
-        request = await get_request_by_id(request_id)
-        if not request:
-            await interaction.followup.send("This request is no longer available.", ephemeral=True)
-            return
-        
-        # Check if user is trying to accept their own request
-        if request['user_id'] == interaction.user.id:
-            await interaction.followup.send("You cannot accept your own request.", ephemeral=True)
-            return
+        accepter_id = interaction.user.id
         
-        # Check if user is already in a chat
-        if await self.bot.message_handler.is_in_active_chat(interaction.user.id):
+        # Check if user is already in a chat before touching the database
+        if await self.bot.message_handler.is_in_active_chat(accepter_id):
             await interaction.followup.send(
                 "You are already in an active coffee chat. Please end your current chat before accepting a new one.",
                 ephemeral=True
             )
             return
         
-        # Check if request is still pending
-        if request['status'] != 'pending':
-            await interaction.followup.send(
-                f"This request has already been {request['status']}.",
-                ephemeral=True
-            )
+        result = await self.claim_request(request_id, accepter_id)
+        
+        if not result.accepted:
+            if result.status == ACCEPT_NOT_FOUND:
+                message = "This request is no longer available."
+            elif result.status == ACCEPT_OWN_REQUEST:
+                message = "You cannot accept your own request."
+            elif result.status == ACCEPT_IN_CHAT:
+                message = "You are already in an active coffee chat. Please end your current chat before accepting a new one."
+            else:
+                message = f"This request has already been {result.request['status']}."
+            await interaction.followup.send(message, ephemeral=True)
             return
         
-        # Cancel any pending requests from the accepting user
-        existing_request = await get_user_request(interaction.user.id)
-        if existing_request:
-            await cancel_request(existing_request['request_id'])
-            
-            # Try to update the request message if it exists
-            try:
-                request_channel = self.bot.get_channel(int(existing_request['channel_id']))
-                if request_channel:
-                    try:
-                        request_message = await request_channel.fetch_message(int(existing_request['message_id']))
-                        if request_message:
-                            cancelled_embed = discord.Embed(
-                                title="☕ Coffee Chat Request Cancelled",
-                                description=f"This request was automatically cancelled because {interaction.user.mention} accepted another coffee chat.",
-                                color=discord.Color.light_grey()
-                            )
-                            await request_message.edit(embed=cancelled_embed, view=None)
-                    except (discord.NotFound, discord.Forbidden):
-                        pass  # Message may have been deleted or bot lacks permissions
-            except Exception as e:
-                logger.error(f"Error updating cancelled request message: {e}")
-        
-        # Create the chat
-        requester_id = int(request['user_id'])
+        await self.start_accepted_chat(interaction, result)
+    
+    async def claim_request(self, request_id, accepter_id):
+        """Accept a request in the database, keeping the matcher in step."""
+        # Claim the request, cancel the accepter's own request and create the chat in one transaction
+        result = await accept_request(request_id, accepter_id)
+        
+        # Stop matching requests that are no longer open
+        if result.status not in (ACCEPT_OWN_REQUEST, ACCEPT_IN_CHAT):
+            self.matcher.remove(request_id)
+        if result.cancelled_request:
+            self.matcher.remove(result.cancelled_request['request_id'])
+        return result
+    
+    async def start_accepted_chat(self, interaction: discord.Interaction, result, matched=False):
+        """Start the chat of a request the interaction's user has accepted."""
+        request = result.request
         accepter_id = interaction.user.id
         
-        chat_id = await create_chat(request_id, requester_id, accepter_id)
-        
-        # Update the request status
-        await update_request_message_info(request_id, 'status', 'accepted')
+        # Update the message of the accepter's automatically cancelled request in the background
+        if result.cancelled_request:
+            self.bot.message_handler.run_in_background(
+                self.update_cancelled_request_message(result.cancelled_request, interaction.user)
+            )
         
-        # Get user objects
-        requester = self.bot.get_user(requester_id)
-        accepter = self.bot.get_user(accepter_id)
+        requester_id = int(request['user_id'])
         
-        if not requester or not accepter:
-            # Try to fetch users if not in cache
-            try:
-                if not requester:
-                    requester = await self.bot.fetch_user(requester_id)
-                if not accepter:
-                    accepter = await self.bot.fetch_user(accepter_id)
-            except discord.NotFound:
-                await interaction.followup.send(
-                    "Could not find one of the users for this chat. The request may be invalid.",
-                    ephemeral=True
-                )
-                return
+        # Get user objects, caching them for the rest of the chat
+        participants = self.bot.message_handler.participants
+        try:
+            requester, accepter = await asyncio.gather(
+                participants.get_user(requester_id),
+                participants.get_user(accepter_id)
+            )
+        except discord.NotFound:
+            await interaction.followup.send(
+                "Could not find one of the users for this chat. The request may be invalid.",
+                ephemeral=True
+            )
+            return
         
         # Start the chat
-        success = await self.bot.message_handler.start_chat(chat_id, requester, accepter, request['topic'])
+        success = await self.bot.message_handler.start_chat(result.chat)
         
         if success:
             # Send confirmation to the accepter
-            await interaction.followup.send(
-                f"You've accepted a coffee chat with {requester.name}! Check your DMs to start chatting.",
-                ephemeral=True
-            )
-            
-            # Update the request message
-            try:
-                request_channel = self.bot.get_channel(int(request['channel_id']))
-                if request_channel:
-                    try:
-                        request_message = await request_channel.fetch_message(int(request['message_id']))
-                        if request_message:
-                            accepted_embed = discord.Embed(
-                                title="☕ Coffee Chat In Progress",
-                                description=f"**Topic:** {request['topic']}\n\n"
-                                           f"**Requested by:** {requester.mention}\n"
-                                           f"**Accepted by:** {accepter.mention}\n"
-                                           f"**Started:** <t:{int(datetime.now().timestamp())}:R>",
-                                color=discord.Color.green()
-                            )
-                            await request_message.edit(embed=accepted_embed, view=None)
-                    except (discord.NotFound, discord.Forbidden):
-                        pass  # Message may have been deleted or bot lacks permissions
-            except Exception as e:
-                logger.error(f"Error updating accepted request message: {e}")
+            if matched:
+                confirmation = f"You've been matched with {requester.name} to talk about **{request['topic']}**! Check your DMs to start chatting."
+            else:
+                confirmation = f"You've accepted a coffee chat with {requester.name}! Check your DMs to start chatting."
+            await interaction.followup.send(confirmation, ephemeral=True)
             
-            # Update bot status
+            # The request message is cosmetic, so update it in the background
+            self.bot.message_handler.run_in_background(
+                self.update_accepted_request_message(request, requester, accepter)
+            )
             await self.update_bot_status()
         else:
             await interaction.followup.send(
@@ -473,6 +519,31 @@ class CoffeeCommands(commands.Cog):
                 ephemeral=True
             )
     
+    async def update_cancelled_request_message(self, existing_request, accepter):
+        """Update the message of a request cancelled because its author accepted another."""
+        cancelled_embed = discord.Embed(
+            title="☕ Coffee Chat Request Cancelled",
+            description=f"This request was automatically cancelled because {accepter.mention} accepted another coffee chat.",
+            color=discord.Color.light_grey()
+        )
+        await self.bot.message_handler.request_messages.edit(
+            existing_request['channel_id'], existing_request['message_id'], cancelled_embed
+        )
+    
+    async def update_accepted_request_message(self, request, requester, accepter):
+        """Update a request message to show its chat is in progress."""
+        accepted_embed = discord.Embed(
+            title="☕ Coffee Chat In Progress",
+            description=f"**Topic:** {request['topic']}\n\n"
+                       f"**Requested by:** {requester.mention}\n"
+                       f"**Accepted by:** {accepter.mention}\n"
+                       f"**Started:** <t:{int(datetime.now().timestamp())}:R>",
+            color=discord.Color.green()
+        )
+        await self.bot.message_handler.request_messages.edit(
+            request['channel_id'], request['message_id'], accepted_embed
+        )
+    
     async def handle_stats(self, interaction: discord.Interaction):
         """Handle a user clicking the My Stats button."""
         # Get user stats
@@ -486,8 +557,11 @@ class CoffeeCommands(commands.Cog):
                 'rating': 0
             }
         
+        # Get the user's rank from the in-memory leaderboard
+        rank = await get_user_rank(interaction.user.id)
+        
         # Create stats embed
-        embed = create_stats_embed(interaction.user, stats)
+        embed = create_stats_embed(interaction.user, stats, rank)
         
         # Edit the original message
         await interaction.response.edit_message(embed=embed)
@@ -497,39 +571,61 @@ class CoffeeCommands(commands.Cog):
         # Get leaderboard data
         leaderboard = await get_leaderboard(limit=10)
         
+        # Get the leaderboard for chats requested from this server
+        server_leaderboard = None
+        if interaction.guild:
+            server_leaderboard = await get_leaderboard(limit=5, server_id=interaction.guild.id)
+        
         # Create leaderboard embed
-        embed = create_leaderboard_embed(leaderboard)
+        embed = create_leaderboard_embed(
+            leaderboard,
+            server_leaderboard=server_leaderboard,
+            server_name=interaction.guild.name if interaction.guild else None
+        )
         
         # Edit the original message
         await interaction.response.edit_message(embed=embed)
     
     async def handle_cancel(self, interaction: discord.Interaction):
         """Handle a user clicking the Cancel My Request button."""
-        # Get user's pending request
-        request = await get_user_request(interaction.user.id)
-        
-        if not request:
-            embed = discord.Embed(
-                title="No Active Request",
-                description="You don't have an active coffee chat request to cancel.",
-                color=discord.Color.red()
-            )
-            await interaction.response.edit_message(embed=embed)
-            return
-        
-        # Check if user is in an active chat
-        in_active_chat = await self.bot.message_handler.is_in_active_chat(interaction.user.id)
-        if in_active_chat:
-            embed = discord.Embed(
-                title="Cannot Cancel Request",
-                description="You are currently in an active coffee chat. Please end the chat before cancelling your request.",
-                color=discord.Color.red()
-            )
-            await interaction.response.edit_message(embed=embed)
-            return
-        
-        # Cancel the request
-        await cancel_request(request['request_id'])
+        # Turn away a repeated click before touching the database
+        async with self.bot.locks.hold(user_key(interaction.user.id), wait=False) as acquired:
+            if not acquired:
+                await interaction.response.send_message("Your request is already being processed.", ephemeral=True)
+                return
+            
+            # Get user's pending request
+            request = await get_user_request(interaction.user.id)
+            
+            if not request:
+                embed = discord.Embed(
+                    title="No Active Request",
+                    description="You don't have an active coffee chat request to cancel.",
+                    color=discord.Color.red()
+                )
+                await interaction.response.edit_message(embed=embed)
+                return
+            
+            # Don't race an accept of the request
+            async with self.bot.locks.hold(request_key(request['request_id']), wait=False) as acquired:
+                if not acquired:
+                    await interaction.response.send_message("Your request is being accepted right now.", ephemeral=True)
+                    return
+                
+                # Check if user is in an active chat
+                in_active_chat = await self.bot.message_handler.is_in_active_chat(interaction.user.id)
+                if in_active_chat:
+                    embed = discord.Embed(
+                        title="Cannot Cancel Request",
+                        description="You are currently in an active coffee chat. Please end the chat before cancelling your request.",
+                        color=discord.Color.red()
+                    )
+                    await interaction.response.edit_message(embed=embed)
+                    return
+                
+                # Cancel the request
+                await cancel_request(request['request_id'])
+                self.matcher.remove(request['request_id'])
         
         # Update bot status
         await self.update_bot_status()
@@ -542,8 +638,7 @@ class CoffeeCommands(commands.Cog):
         )
         
         # Get pending requests count for the button label
-        pending_requests = await get_pending_requests(exclude_user_id=interaction.user.id)
-        request_count = len(pending_requests)
+        request_count = await get_pending_request_count(exclude_user_id=interaction.user.id)
         
         # Create a new custom view with the updated button configuration
         view = self.CustomCoffeeChatMainView(
@@ -555,13 +650,16 @@ class CoffeeCommands(commands.Cog):
             end_chat_callback=self.handle_end_chat_button,
             has_pending_request=False,  # No longer has a pending request
             in_active_chat=in_active_chat,
-            request_count=request_count
+            request_count=request_count,
+            match_callback=self.handle_find_match
         )
         
-        # Add callback for the custom button
+        # Add callbacks for the custom buttons
         for item in view.children:
             if isinstance(item, discord.ui.Button) and item.custom_id == "view_requests":
                 item.callback = view.view_requests_button_callback
+            elif isinstance(item, discord.ui.Button) and item.custom_id == "find_match":
+                item.callback = view.find_match_button_callback
         
         # Edit the original message
         await interaction.response.edit_message(embed=embed, view=view)
@@ -570,28 +668,34 @@ class CoffeeCommands(commands.Cog):
         """Handle the end chat button."""
         user_id = interaction.user.id
         
-        # Check if user is in an active chat
-        if user_id not in self.bot.message_handler.active_chats:
-            embed = discord.Embed(
-                title="No Active Chat",
-                description="You are not currently in an active coffee chat.",
-                color=discord.Color.red()
-            )
-            await interaction.response.edit_message(embed=embed, view=None)
-            return
-        
-        # Get chat partner info before ending chat
-        chat_data = self.bot.message_handler.active_chats[user_id]
-        partner_id = chat_data['partner_id']
-        
-        try:
-            partner = await self.bot.fetch_user(partner_id)
-            partner_name = f"{partner.display_name} ({partner.name})"
-        except:
-            partner_name = "your partner"
-        
-        # End the chat
-        await self.bot.message_handler.end_user_chat(user_id)
+        # Turn away repeated clicks while the chat is being ended
+        async with self.bot.locks.hold(user_key(user_id), wait=False) as acquired:
+            if not acquired:
+                await interaction.response.send_message("Your chat is already being ended.", ephemeral=True)
+                return
+            
+            # Check if user is in an active chat
+            session = self.bot.message_handler.sessions.get(user_id)
+            if not session:
+                embed = discord.Embed(
+                    title="No Active Chat",
+                    description="You are not currently in an active coffee chat.",
+                    color=discord.Color.red()
+                )
+                await interaction.response.edit_message(embed=embed, view=None)
+                return
+            
+            # Get chat partner info before ending chat
+            partner_id = session.partner_of(user_id)
+            
+            try:
+                partner = await self.bot.message_handler.participants.get_user(partner_id)
+                partner_name = f"{partner.display_name} ({partner.name})"
+            except:
+                partner_name = "your partner"
+            
+            # End the chat
+            await self.bot.message_handler.end_user_chat(user_id)
         
         # Create stylized embed for the end chat message
         embed = discord.Embed(
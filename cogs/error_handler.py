@@ -20,19 +20,19 @@ class ErrorHandler(commands.Cog):
             return
         
         if isinstance(error, commands.MissingRequiredArgument):
-            await ctx.send(f"Missing required argument: {error.param}")
+            await self.bot.scheduler.send(ctx, content=f"Missing required argument: {error.param}")
             return
         
         if isinstance(error, commands.BadArgument):
-            await ctx.send(f"Bad argument: {error}")
+            await self.bot.scheduler.send(ctx, content=f"Bad argument: {error}")
             return
         
         if isinstance(error, commands.MissingPermissions):
-            await ctx.send(f"You don't have the required permissions: {', '.join(error.missing_permissions)}")
+            await self.bot.scheduler.send(ctx, content=f"You don't have the required permissions: {', '.join(error.missing_permissions)}")
             return
         
         if isinstance(error, commands.BotMissingPermissions):
-            await ctx.send(f"I don't have the required permissions: {', '.join(error.missing_permissions)}")
+            await self.bot.scheduler.send(ctx, content=f"I don't have the required permissions: {', '.join(error.missing_permissions)}")
             return
         
         # Log the error
@@ -40,7 +40,7 @@ class ErrorHandler(commands.Cog):
         logger.error(''.join(traceback.format_exception(type(error), error, error.__traceback__)))
         
         # Send error message to user
-        await ctx.send("An error occurred while executing the command. Please try again later.")
+        await self.bot.scheduler.send(ctx, content="An error occurred while executing the command. Please try again later.")
     
     @commands.Cog.listener()
     async def on_error(self, event, *args, **kwargs):
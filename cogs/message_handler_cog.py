@@ -18,6 +18,10 @@ class MessageHandlerCog(commands.Cog):
         self.bot = bot
         self.bot.message_handler = MessageHandler(bot)
     
+    async def cog_unload(self):
+        """Release the message handler's resources."""
+        await self.bot.message_handler.close()
+    
     @commands.Cog.listener()
     async def on_message(self, message):
         """Handle direct messages for coffee chats."""
@@ -47,7 +51,7 @@ class MessageHandlerCog(commands.Cog):
                     color=discord.Color.blue()
                 )
                 
-                await message.author.send(embed=embed)
+                await self.bot.scheduler.send(message.channel, embed=embed)
 
 async def setup(bot):
     await bot.add_cog(MessageHandlerCog(bot))
@@ -1,7 +1,10 @@
-from .db_setup import initialize_database
+from .db_setup import initialize_database, close_database
+from .pool import get_pool_metrics
+from .message_log import log_message
 from .db_operations import (
     # User operations
     get_or_create_user,
+    get_cached_username,
     get_user_stats,
     
     # Server operations
@@ -11,40 +14,78 @@ from .db_operations import (
     create_chat_request,
     update_request_message_info,
     get_pending_requests,
+    get_pending_requests_page,
+    get_pending_request_count,
+    get_menu_snapshot,
+    get_menu_metrics,
     get_user_request,
     cancel_request,
     get_request_by_chat_id,
     get_request_by_id,
     
     # Chat operations
-    create_chat,
+    accept_request,
+    AcceptResult,
+    ACCEPT_ACCEPTED,
+    ACCEPT_NOT_FOUND,
+    ACCEPT_NOT_PENDING,
+    ACCEPT_OWN_REQUEST,
+    ACCEPT_IN_CHAT,
     get_active_chat,
+    get_active_chats,
     end_chat,
+    abort_chat,
     get_chat_details,
     
     # Message operations
     save_message,
     
     # Leaderboard operations
-    get_leaderboard
+    get_leaderboard,
+    get_user_rank,
+    
+    # Pending message edit operations
+    save_pending_edit,
+    delete_pending_edit,
+    get_pending_edits
 )
 
 __all__ = [
     'initialize_database',
+    'close_database',
+    'get_pool_metrics',
     'get_or_create_user',
+    'get_cached_username',
     'get_user_stats',
     'get_or_create_server',
     'create_chat_request',
     'update_request_message_info',
     'get_user_request',
     'get_pending_requests',
+    'get_pending_requests_page',
+    'get_pending_request_count',
+    'get_menu_snapshot',
+    'get_menu_metrics',
     'cancel_request',
     'get_request_by_chat_id',
     'get_request_by_id',
-    'create_chat',
+    'accept_request',
+    'AcceptResult',
+    'ACCEPT_ACCEPTED',
+    'ACCEPT_NOT_FOUND',
+    'ACCEPT_NOT_PENDING',
+    'ACCEPT_OWN_REQUEST',
+    'ACCEPT_IN_CHAT',
     'get_active_chat',
+    'get_active_chats',
     'end_chat',
+    'abort_chat',
     'get_chat_details',
     'save_message',
-    'get_leaderboard'
+    'log_message',
+    'get_leaderboard',
+    'get_user_rank',
+    'save_pending_edit',
+    'delete_pending_edit',
+    'get_pending_edits'
 ]
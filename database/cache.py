@@ -0,0 +1,77 @@
+import time
+from collections import OrderedDict
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry.
+
+    Entries optionally expire ttl seconds after they were stored. Hit, miss
+    and eviction counters are kept for metrics.
+    """
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()  # {key: (value, expires_at)}
+
+    def _is_expired(self, expires_at):
+        return expires_at is not None and expires_at <= time.monotonic()
+
+    def get(self, key, default=None):
+        """Get a value, marking it as recently used."""
+        entry = self._data.get(key)
+        if entry is None or self._is_expired(entry[1]):
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def peek(self, key, default=None):
+        """Get a value without marking it as used or counting a hit or miss."""
+        entry = self._data.get(key)
+        if entry is None or self._is_expired(entry[1]):
+            return default
+        return entry[0]
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry if full."""
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        """Remove a value and return it."""
+        entry = self._data.pop(key, None)
+        if entry is None or self._is_expired(entry[1]):
+            return default
+        return entry[0]
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and not self._is_expired(entry[1])
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_metrics(self):
+        """Return size and hit/miss/eviction counters."""
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
@@ -1,48 +1,77 @@
-import aiosqlite
+import asyncio
+import json
 import logging
+import os
+import time
+from dataclasses import dataclass
 from datetime import datetime
-from pathlib import Path
+
+from .cache import LRUCache
+from .leaderboard import leaderboard
+from .metrics import LatencyHistogram
+from .pending_counter import pending_counter
+from .pool import get_pool
 
 logger = logging.getLogger('coffee_bot.database')
 
-DB_PATH = Path('coffee_bot.db')
+# Recently seen users and servers, keyed by their Discord IDs
+IDENTITY_CACHE_SIZE = int(os.getenv('IDENTITY_CACHE_SIZE', '10000'))
+_user_cache = LRUCache(IDENTITY_CACHE_SIZE)
+_server_cache = LRUCache(IDENTITY_CACHE_SIZE)
+
+# Discord select menus hold at most 25 options
+REQUEST_PAGE_SIZE = 25
+
+# Time taken to gather everything the /coffee menu shows
+_menu_latency = LatencyHistogram()
+
+def clear_caches():
+    """Forget everything cached from the database, for when it is closed."""
+    _user_cache.clear()
+    _server_cache.clear()
+    pending_counter.reset()
+    leaderboard.reset()
 
 # User operations
 async def get_or_create_user(user_id, username, discriminator=None):
-    """Get a user from the database or create if not exists."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        
-        # Check if user exists
+    """Get a user from the database or create if not exists.
+
+    Recently seen users are served from the identity cache. New users and
+    changed usernames are written with a single upsert.
+    """
+    user = _user_cache.get(user_id)
+    if user and user['username'] == username and user['discriminator'] == discriminator:
+        return dict(user)
+    
+    async with get_pool().writer() as db:
         cursor = await db.execute(
-            "SELECT * FROM users WHERE user_id = ?", 
-            (user_id,)
-        )
-        user = await cursor.fetchone()
-        
-        if user:
-            return dict(user)
-        
-        # Create new user
-        await db.execute(
-            "INSERT INTO users (user_id, username, discriminator) VALUES (?, ?, ?)",
+            """
+            INSERT INTO users (user_id, username, discriminator) 
+            VALUES (?, ?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET 
+                username = excluded.username, 
+                discriminator = excluded.discriminator
+            RETURNING *
+            """,
             (user_id, username, discriminator)
         )
+        user = dict(await cursor.fetchone())
         await db.commit()
-        
-        # Get the newly created user
-        cursor = await db.execute(
-            "SELECT * FROM users WHERE user_id = ?", 
-            (user_id,)
-        )
-        new_user = await cursor.fetchone()
-        return dict(new_user)
+    
+    _user_cache.put(user_id, user)
+    leaderboard.set_username(user_id, username)
+    return dict(user)
+
+def get_cached_username(user_id):
+    """Get a user's name from memory without querying the database, or None."""
+    user = _user_cache.peek(user_id)
+    if user:
+        return user['username']
+    return leaderboard.usernames.get(user_id)
 
 async def get_user_stats(user_id):
     """Get statistics for a user."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        
+    async with get_pool().reader() as db:
         cursor = await db.execute(
             """
             SELECT 
@@ -64,41 +93,35 @@ async def get_user_stats(user_id):
 
 # Server operations
 async def get_or_create_server(server_id, server_name):
-    """Get a server from the database or create if not exists."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        
-        # Check if server exists
+    """Get a server from the database or create if not exists.
+
+    Recently seen servers are served from the identity cache. New servers and
+    changed server names are written with a single upsert.
+    """
+    server = _server_cache.get(server_id)
+    if server and server['server_name'] == server_name:
+        return dict(server)
+    
+    async with get_pool().writer() as db:
         cursor = await db.execute(
-            "SELECT * FROM servers WHERE server_id = ?", 
-            (server_id,)
-        )
-        server = await cursor.fetchone()
-        
-        if server:
-            return dict(server)
-        
-        # Create new server
-        await db.execute(
-            "INSERT INTO servers (server_id, server_name) VALUES (?, ?)",
+            """
+            INSERT INTO servers (server_id, server_name) 
+            VALUES (?, ?)
+            ON CONFLICT (server_id) DO UPDATE SET server_name = excluded.server_name
+            RETURNING *
+            """,
             (server_id, server_name)
         )
+        server = dict(await cursor.fetchone())
         await db.commit()
-        
-        # Get the newly created server
-        cursor = await db.execute(
-            "SELECT * FROM servers WHERE server_id = ?", 
-            (server_id,)
-        )
-        new_server = await cursor.fetchone()
-        return dict(new_server)
+    
+    _server_cache.put(server_id, server)
+    return dict(server)
 
 # Chat request operations
 async def create_chat_request(user_id, server_id, topic, description):
     """Create a new chat request."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        
+    async with get_pool().writer() as db:
         # Create request
         cursor = await db.execute(
             """
@@ -110,6 +133,7 @@ async def create_chat_request(user_id, server_id, topic, description):
         )
         request_id = cursor.lastrowid
         await db.commit()
+        pending_counter.add(user_id)
         
         # Get the created request
         cursor = await db.execute(
@@ -121,7 +145,7 @@ async def create_chat_request(user_id, server_id, topic, description):
 
 async def update_request_message_info(request_id, message_id, channel_id):
     """Update the message ID and channel ID for a request."""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with get_pool().writer() as db:
         await db.execute(
             """
             UPDATE chat_requests 
@@ -135,9 +159,7 @@ async def update_request_message_info(request_id, message_id, channel_id):
 
 async def get_pending_requests(exclude_user_id=None):
     """Get all pending chat requests, optionally excluding a user's own requests."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        
+    async with get_pool().reader() as db:
         query = """
         SELECT 
             cr.*, 
@@ -161,11 +183,59 @@ async def get_pending_requests(exclude_user_id=None):
         requests = await cursor.fetchall()
         return [dict(r) for r in requests]
 
+async def get_pending_requests_page(exclude_user_id=None, after=None, before=None, limit=REQUEST_PAGE_SIZE):
+    """Get one page of pending chat requests, newest first.
+    
+    Pages are keyed on (created_at, request_id). Pass the key of the last request
+    on a page as `after` to get the next (older) page, or the key of the first
+    request as `before` to get the previous (newer) page.
+    """
+    query = """
+    SELECT 
+        cr.*, 
+        u.username as requester_name,
+        s.server_name
+    FROM chat_requests cr
+    JOIN users u ON cr.user_id = u.user_id
+    JOIN servers s ON cr.server_id = s.server_id
+    WHERE cr.status = 'pending'
+    """
+    
+    params = []
+    if exclude_user_id:
+        query += " AND cr.user_id != ?"
+        params.append(exclude_user_id)
+    
+    if before is not None:
+        # Walk towards newer requests, then flip the page back to newest first
+        query += " AND (cr.created_at, cr.request_id) > (?, ?)"
+        query += " ORDER BY cr.created_at ASC, cr.request_id ASC LIMIT ?"
+        params.extend(before)
+    else:
+        if after is not None:
+            query += " AND (cr.created_at, cr.request_id) < (?, ?)"
+            params.extend(after)
+        query += " ORDER BY cr.created_at DESC, cr.request_id DESC LIMIT ?"
+    
+    # Fetch one extra row to know whether there is another page
+    params.append(limit + 1)
+    
+    async with get_pool().reader() as db:
+        cursor = await db.execute(query, params)
+        rows = [dict(r) for r in await cursor.fetchall()]
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    if before is not None:
+        rows.reverse()
+        return {'requests': rows, 'has_previous': has_more, 'has_next': True}
+    
+    return {'requests': rows, 'has_previous': after is not None, 'has_next': has_more}
+
 async def get_user_request(user_id):
     """Get a user's pending chat request if any."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        
+    async with get_pool().reader() as db:
         cursor = await db.execute(
             """
             SELECT * FROM chat_requests 
@@ -179,101 +249,201 @@ async def get_user_request(user_id):
             return dict(request)
         return None
 
+async def get_menu_snapshot(user_id, username, discriminator=None, server_id=None, server_name=None):
+    """Get everything the /coffee menu needs for a user in one round trip.
+    
+    The user and server are recorded while a single query reads the user's
+    pending request and whether they are in an active chat. The count of
+    requests available to them comes from the in-process counter.
+    """
+    start = time.perf_counter()
+    try:
+        lookups = [get_or_create_user(user_id, username, discriminator), _get_menu_state(user_id)]
+        if server_id is not None:
+            lookups.append(get_or_create_server(server_id, server_name))
+        
+        user, state = (await asyncio.gather(*lookups))[:2]
+        return {
+            'user': user,
+            'pending_request': state['pending_request'],
+            'in_active_chat': state['in_active_chat'],
+            'request_count': pending_counter.count(exclude_user_id=user_id)
+        }
+    finally:
+        _menu_latency.record(time.perf_counter() - start)
+
+async def _get_menu_state(user_id):
+    """Read a user's pending request and active chat flag with one query."""
+    async with get_pool().reader() as db:
+        cursor = await db.execute(
+            """
+            SELECT 
+                cr.*,
+                EXISTS (
+                    SELECT 1 FROM active_chats
+                    WHERE (user1_id = ? OR user2_id = ?) AND status = 'active'
+                ) as in_active_chat
+            FROM (SELECT 1)
+            LEFT JOIN chat_requests cr ON cr.user_id = ? AND cr.status = 'pending'
+            LIMIT 1
+            """,
+            (user_id, user_id, user_id)
+        )
+        row = dict(await cursor.fetchone())
+    
+    in_active_chat = bool(row.pop('in_active_chat'))
+    return {
+        'pending_request': row if row['request_id'] is not None else None,
+        'in_active_chat': in_active_chat
+    }
+
+def get_menu_metrics():
+    """Get the latency histogram of menu snapshots."""
+    return _menu_latency.snapshot()
+
+async def get_pending_request_count(exclude_user_id=None):
+    """Get the number of pending chat requests, optionally excluding a user's own requests."""
+    if not pending_counter.loaded:
+        await pending_counter.reconcile()
+    return pending_counter.count(exclude_user_id)
+
 async def cancel_request(request_id):
-    """Cancel a chat request."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "UPDATE chat_requests SET status = 'cancelled' WHERE request_id = ?",
+    """Cancel a pending chat request."""
+    async with get_pool().writer() as db:
+        cursor = await db.execute(
+            """
+            UPDATE chat_requests SET status = 'cancelled' 
+            WHERE request_id = ? AND status = 'pending'
+            RETURNING user_id
+            """,
             (request_id,)
         )
+        cancelled = await cursor.fetchone()
         await db.commit()
+        
+        if cancelled:
+            pending_counter.remove(cancelled['user_id'])
         return True
 
 # Chat operations
-async def create_chat(request_id, user1_id, user2_id):
-    """Create a new active chat."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+# Outcomes of accept_request
+ACCEPT_ACCEPTED = 'accepted'
+ACCEPT_NOT_FOUND = 'not_found'
+ACCEPT_NOT_PENDING = 'not_pending'
+ACCEPT_OWN_REQUEST = 'own_request'
+ACCEPT_IN_CHAT = 'in_chat'
+
+@dataclass
+class AcceptResult:
+    """Outcome of accept_request.
+    
+    `request` is the accepted request, or its current state when the accept
+    lost. `chat` and `cancelled_request` are only set when the accept won.
+    """
+    status: str
+    request: dict = None
+    chat: dict = None
+    cancelled_request: dict = None
+    
+    @property
+    def accepted(self):
+        return self.status == ACCEPT_ACCEPTED
+
+async def accept_request(request_id, accepter_id):
+    """Atomically accept a pending chat request and start its chat.
+    
+    In a single IMMEDIATE transaction this claims the request with a
+    compare-and-swap on status = 'pending', cancels the accepter's own pending
+    request and creates the active chat. Concurrent accepts of the same request
+    serialize on the write lock, so exactly one of them wins.
+    """
+    async with get_pool().writer() as db:
+        await db.execute("BEGIN IMMEDIATE")
         
-        try:
-            # Update request status
-            await db.execute(
-                "UPDATE chat_requests SET status = 'accepted' WHERE request_id = ?",
+        cursor = await db.execute(
+            """
+            UPDATE chat_requests SET status = 'accepted'
+            WHERE request_id = ? AND status = 'pending' AND user_id != ?
+                AND NOT EXISTS (
+                    SELECT 1 FROM active_chats
+                    WHERE (user1_id = ? OR user2_id = ?) AND status = 'active'
+                )
+            RETURNING *
+            """,
+            (request_id, accepter_id, accepter_id, accepter_id)
+        )
+        request = await cursor.fetchone()
+        
+        if not request:
+            # Lost: find out why before releasing the write lock
+            cursor = await db.execute(
+                "SELECT * FROM chat_requests WHERE request_id = ?",
                 (request_id,)
             )
+            current = await cursor.fetchone()
             
-            # Create active chat
             cursor = await db.execute(
                 """
-                INSERT INTO active_chats 
-                    (request_id, user1_id, user2_id) 
-                VALUES (?, ?, ?)
+                SELECT 1 FROM active_chats
+                WHERE (user1_id = ? OR user2_id = ?) AND status = 'active'
                 """,
-                (request_id, user1_id, user2_id)
-            )
-            chat_id = cursor.lastrowid
-            await db.commit()
-            
-            # Get the created chat
-            cursor = await db.execute(
-                """
-                SELECT 
-                    ac.*, 
-                    cr.topic, 
-                    cr.description,
-                    u1.username as user1_name,
-                    u2.username as user2_name
-                FROM active_chats ac
-                JOIN chat_requests cr ON ac.request_id = cr.request_id
-                JOIN users u1 ON ac.user1_id = u1.user_id
-                JOIN users u2 ON ac.user2_id = u2.user_id
-                WHERE ac.chat_id = ?
-                """, 
-                (chat_id,)
+                (accepter_id, accepter_id)
             )
-            chat = await cursor.fetchone()
-            
-            if chat is None:
-                # If we couldn't retrieve the chat details, create a basic chat dict
-                logging.warning(f"Could not retrieve chat details for chat_id {chat_id}")
-                return {
-                    'chat_id': chat_id,
-                    'request_id': request_id,
-                    'user1_id': user1_id,
-                    'user2_id': user2_id,
-                    'status': 'active',
-                    'created_at': datetime.now().isoformat(),
-                    'topic': 'Unknown Topic',
-                    'description': 'No description available',
-                    'user1_name': 'User 1',
-                    'user2_name': 'User 2'
-                }
-            
-            return dict(chat)
-            
-        except Exception as e:
-            logging.error(f"Error creating chat: {e}")
-            # Rollback in case of error
+            in_chat = await cursor.fetchone()
             await db.rollback()
-            # Return a basic error chat dict
-            return {
-                'chat_id': -1,
-                'request_id': request_id,
-                'user1_id': user1_id,
-                'user2_id': user2_id,
-                'status': 'error',
-                'created_at': datetime.now().isoformat(),
-                'topic': 'Error',
-                'description': f'Error creating chat: {str(e)}',
-                'user1_name': 'User 1',
-                'user2_name': 'User 2'
-            }
+            
+            if not current:
+                return AcceptResult(ACCEPT_NOT_FOUND)
+            current = dict(current)
+            if current['user_id'] == accepter_id:
+                return AcceptResult(ACCEPT_OWN_REQUEST, request=current)
+            if in_chat:
+                return AcceptResult(ACCEPT_IN_CHAT, request=current)
+            return AcceptResult(ACCEPT_NOT_PENDING, request=current)
+        
+        request = dict(request)
+        
+        # Cancel the accepter's own pending request
+        cursor = await db.execute(
+            """
+            UPDATE chat_requests SET status = 'cancelled'
+            WHERE user_id = ? AND status = 'pending'
+            RETURNING *
+            """,
+            (accepter_id,)
+        )
+        cancelled = await cursor.fetchall()
+        
+        # Create active chat
+        cursor = await db.execute(
+            """
+            INSERT INTO active_chats 
+                (request_id, user1_id, user2_id) 
+            VALUES (?, ?, ?)
+            RETURNING *
+            """,
+            (request_id, request['user_id'], accepter_id)
+        )
+        chat = dict(await cursor.fetchone())
+        await db.commit()
+    
+    pending_counter.remove(request['user_id'])
+    for _ in cancelled:
+        pending_counter.remove(accepter_id)
+    
+    chat['topic'] = request['topic']
+    chat['description'] = request['description']
+    
+    return AcceptResult(
+        ACCEPT_ACCEPTED,
+        request=request,
+        chat=chat,
+        cancelled_request=dict(cancelled[0]) if cancelled else None
+    )
 
 async def get_active_chat(user_id):
     """Get a user's active chat if any."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        
+    async with get_pool().reader() as db:
         cursor = await db.execute(
             """
             SELECT 
@@ -296,66 +466,160 @@ async def get_active_chat(user_id):
             return dict(chat)
         return None
 
+async def get_active_chats():
+    """Get every active chat, for rebuilding in-memory chat state at startup."""
+    async with get_pool().reader() as db:
+        cursor = await db.execute(
+            """
+            SELECT chat_id, request_id, user1_id, user2_id, started_at
+            FROM active_chats
+            WHERE status = 'active'
+            """
+        )
+        return [dict(row) for row in await cursor.fetchall()]
+
 async def end_chat(chat_id, duration=None):
-    """End an active chat and record history."""
-    async with aiosqlite.connect(DB_PATH) as db:
+    """End an active chat and record history.
+    
+    The chat, its request, the history entry and both users' stats are updated
+    in a single transaction. Returns the completed request in the same shape as
+    get_request_by_chat_id, or None if the chat was not active.
+    """
+    async with get_pool().writer() as db:
         # Update chat status
-        await db.execute(
-            "UPDATE active_chats SET status = 'ended' WHERE chat_id = ?",
+        cursor = await db.execute(
+            """
+            UPDATE active_chats SET status = 'ended' 
+            WHERE chat_id = ? AND status = 'active'
+            RETURNING request_id, user1_id, user2_id, started_at
+            """,
             (chat_id,)
         )
+        chat = await cursor.fetchone()
+        if not chat:
+            # Don't leave the transaction open on the shared writer
+            await db.rollback()
+            return None
         
-        # Get the request_id for this chat
+        # Update request status to completed
         cursor = await db.execute(
-            "SELECT request_id FROM active_chats WHERE chat_id = ?",
-            (chat_id,)
+            """
+            UPDATE chat_requests SET status = 'completed' 
+            WHERE request_id = ?
+            RETURNING *
+            """,
+            (chat['request_id'],)
         )
-        result = await cursor.fetchone()
-        if result:
-            request_id = result[0]
-            # Update request status to completed
-            await db.execute(
-                "UPDATE chat_requests SET status = 'completed' WHERE request_id = ?",
-                (request_id,)
-            )
+        request = await cursor.fetchone()
         
         # Create chat history entry
+        ended_at = datetime.now().isoformat()
         await db.execute(
             """
             INSERT INTO chat_history 
                 (chat_id, ended_at, duration) 
             VALUES (?, ?, ?)
             """,
-            (chat_id, datetime.now().isoformat(), duration)
+            (chat_id, ended_at, duration)
         )
         
         # Update user stats
+        participants = None
         if duration:
-            chat = await db.execute(
-                "SELECT user1_id, user2_id FROM active_chats WHERE chat_id = ?",
-                (chat_id,)
+            cursor = await db.execute(
+                """
+                UPDATE users 
+                SET total_chats = total_chats + 1, total_time = total_time + ? 
+                WHERE user_id IN (?, ?)
+                RETURNING user_id, username
+                """,
+                (duration, chat['user1_id'], chat['user2_id'])
             )
-            chat_data = await chat.fetchone()
-            
-            if chat_data:
-                user1_id, user2_id = chat_data
-                
-                await db.execute(
-                    """
-                    UPDATE users 
-                    SET total_chats = total_chats + 1, total_time = total_time + ? 
-                    WHERE user_id IN (?, ?)
-                    """,
-                    (duration, user1_id, user2_id)
-                )
+            participants = [(row['user_id'], row['username']) for row in await cursor.fetchall()]
         
         await db.commit()
-        return True
+    
+    if participants:
+        # Cached user rows would now have stale totals
+        for user_id, _ in participants:
+            _user_cache.pop(user_id)
+        leaderboard.record_chat(request['server_id'] if request else None, participants, duration)
+    
+    if not request:
+        return None
+    
+    return _chat_request_info(chat_id, chat, request, ended_at, duration)
+
+async def abort_chat(chat_id, unreachable_id):
+    """End a chat that could not be started because a user can't be reached.
+    
+    The request is only cancelled if its requester is the one who can't be
+    reached. If it was the accepter, the request goes back to 'pending' so
+    the requester doesn't lose it over someone else's closed DMs. Unlike
+    end_chat, no history or stats are recorded. Returns the request in the
+    same shape as end_chat, or None if the chat was not active.
+    """
+    async with get_pool().writer() as db:
+        cursor = await db.execute(
+            """
+            UPDATE active_chats SET status = 'ended' 
+            WHERE chat_id = ? AND status = 'active'
+            RETURNING request_id, user1_id, user2_id, started_at
+            """,
+            (chat_id,)
+        )
+        chat = await cursor.fetchone()
+        if not chat:
+            # Don't leave the transaction open on the shared writer
+            await db.rollback()
+            return None
+        
+        # Requests are accepted by user2, so user1 is always the requester
+        status = 'cancelled' if unreachable_id == chat['user1_id'] else 'pending'
+        cursor = await db.execute(
+            """
+            UPDATE chat_requests SET status = ? 
+            WHERE request_id = ?
+            RETURNING *
+            """,
+            (status, chat['request_id'])
+        )
+        request = await cursor.fetchone()
+        
+        await db.commit()
+    
+    if not request:
+        return None
+    
+    if status == 'pending':
+        pending_counter.add(request['user_id'])
+    
+    return _chat_request_info(chat_id, chat, request, datetime.now().isoformat(), 0)
+
+def _chat_request_info(chat_id, chat, request, ended_at, duration):
+    """Combine an ended chat and its request into the shape used to render request messages."""
+    return {
+        'chat_id': chat_id,
+        'request_id': request['request_id'],
+        'requester_id': request['user_id'],
+        'responder_id': chat['user2_id'],
+        'guild_id': request['server_id'],
+        'topic': request['topic'],
+        'description': request['description'],
+        'created_at': request['created_at'],
+        'status': request['status'],
+        'message_id': request['message_id'],
+        'channel_id': request['channel_id'],
+        'accepted_at': chat['started_at'],
+        'completed_at': ended_at,
+        'cancelled_at': ended_at,
+        'duration': duration
+    }
 
 # Message operations
 async def save_message(chat_id, sender_id, content, has_attachment=False):
     """Save a message to the database."""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with get_pool().writer() as db:
         cursor = await db.execute(
             """
             INSERT INTO messages 
@@ -369,34 +633,21 @@ async def save_message(chat_id, sender_id, content, has_attachment=False):
         return message_id
 
 # Leaderboard operations
-async def get_leaderboard(limit=10):
-    """Get the coffee chat leaderboard."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        
-        cursor = await db.execute(
-            """
-            SELECT 
-                user_id, 
-                username, 
-                COALESCE(total_chats, 0) as total_chats, 
-                COALESCE(total_time, 0) as total_time, 
-                COALESCE(rating, 0) as rating
-            FROM users
-            WHERE COALESCE(total_chats, 0) > 0
-            ORDER BY total_chats DESC, total_time DESC
-            LIMIT ?
-            """,
-            (limit,)
-        )
-        leaderboard = await cursor.fetchall()
-        return [dict(entry) for entry in leaderboard]
+async def get_leaderboard(limit=10, server_id=None):
+    """Get the coffee chat leaderboard, optionally for a single server."""
+    if not leaderboard.loaded:
+        await leaderboard.rebuild()
+    return leaderboard.top(limit, server_id)
+
+async def get_user_rank(user_id, server_id=None):
+    """Get a user's (rank, ranked_users) on the leaderboard, or None if unranked."""
+    if not leaderboard.loaded:
+        await leaderboard.rebuild()
+    return leaderboard.rank(user_id, server_id)
 
 async def get_chat_details(chat_id):
     """Get detailed information about a chat for updating the request message."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        
+    async with get_pool().reader() as db:
         # Get chat data including request info and user names
         cursor = await db.execute(
             """
@@ -433,9 +684,7 @@ async def get_chat_details(chat_id):
 
 async def get_request_by_chat_id(chat_id):
     """Get a request by its associated chat ID."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        
+    async with get_pool().reader() as db:
         cursor = await db.execute(
             """
             SELECT 
@@ -468,9 +717,7 @@ async def get_request_by_chat_id(chat_id):
 
 async def get_request_by_id(request_id):
     """Get a request by its ID."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        
+    async with get_pool().reader() as db:
         cursor = await db.execute(
             """
             SELECT 
@@ -489,7 +736,10 @@ async def get_request_by_id(request_id):
                 ch.ended_at as cancelled_at,
                 ch.duration
             FROM chat_requests cr
-            LEFT JOIN active_chats ac ON cr.request_id = ac.request_id
+            -- A request put back to pending after an aborted chat can have several chats; use the latest
+            LEFT JOIN active_chats ac ON ac.chat_id = (
+                SELECT MAX(chat_id) FROM active_chats WHERE request_id = cr.request_id
+            )
             LEFT JOIN chat_history ch ON ac.chat_id = ch.chat_id
             WHERE cr.request_id = ?
             """,
@@ -500,3 +750,49 @@ async def get_request_by_id(request_id):
         if request:
             return dict(request)
         return None
+
+# Pending message edit operations
+async def save_pending_edit(message_id, channel_id, embed, accept_request_id, version):
+    """Store the latest state scheduled for a message, replacing any earlier one."""
+    async with get_pool().writer() as db:
+        await db.execute(
+            """
+            INSERT INTO pending_message_edits 
+                (message_id, channel_id, embed, accept_request_id, version) 
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (message_id) DO UPDATE SET 
+                channel_id = excluded.channel_id, 
+                embed = excluded.embed, 
+                accept_request_id = excluded.accept_request_id, 
+                version = excluded.version, 
+                updated_at = CURRENT_TIMESTAMP
+            """,
+            (message_id, channel_id, json.dumps(embed), accept_request_id, version)
+        )
+        await db.commit()
+
+async def delete_pending_edit(message_id, version):
+    """Remove a message's pending edit once it is applied, unless a newer one replaced it."""
+    async with get_pool().writer() as db:
+        await db.execute(
+            "DELETE FROM pending_message_edits WHERE message_id = ? AND version = ?",
+            (message_id, version)
+        )
+        await db.commit()
+
+async def get_pending_edits():
+    """Get every pending message edit, oldest first."""
+    async with get_pool().reader() as db:
+        cursor = await db.execute(
+            """
+            SELECT message_id, channel_id, embed, accept_request_id, version
+            FROM pending_message_edits
+            ORDER BY updated_at
+            """
+        )
+        edits = []
+        for row in await cursor.fetchall():
+            edit = dict(row)
+            edit['embed'] = json.loads(edit['embed'])
+            edits.append(edit)
+        return edits
@@ -1,8 +1,13 @@
-import aiosqlite
 import logging
-import os
 from pathlib import Path
 
+from .pool import open_pool, close_pool, get_pool
+from .leaderboard import leaderboard
+from .message_log import message_log
+from .pending_counter import pending_counter
+from .db_operations import clear_caches
+from .migrate import load_migrations, run_migrations, verify_indexes
+
 logger = logging.getLogger('coffee_bot.database')
 
 DB_PATH = Path('coffee_bot.db')
@@ -11,7 +16,7 @@ async def create_tables():
     """Create all necessary database tables if they don't exist."""
     logger.info("Setting up database tables")
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with get_pool().writer() as db:
         # Users table
         await db.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -96,8 +101,32 @@ async def create_tables():
         await db.commit()
         logger.info("Database tables created successfully")
 
+async def migrate_database():
+    """Apply pending schema migrations and check that their indexes exist."""
+    migrations = load_migrations()
+
+    async with get_pool().writer() as db:
+        await run_migrations(db, migrations)
+        await verify_indexes(db, migrations)
+
 async def initialize_database():
-    """Initialize the database and create tables."""
+    """Initialize the database connection pool and create tables."""
     logger.info(f"Initializing database at {DB_PATH}")
+    await open_pool(DB_PATH)
     await create_tables()
+    await migrate_database()
+    message_log.start()
+    await pending_counter.reconcile()
+    pending_counter.start()
+    await leaderboard.rebuild()
     logger.info("Database initialization complete")
+
+async def close_database():
+    """Flush queued writes and close all database connections."""
+    await pending_counter.stop()
+    await message_log.stop()
+    await close_pool()
+
+    # Cached rows belong to the closed database
+    clear_caches()
+    logger.info("Database connections closed")
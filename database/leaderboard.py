@@ -0,0 +1,175 @@
+import logging
+from bisect import bisect_left, insort
+
+from .pool import get_pool
+
+logger = logging.getLogger('coffee_bot.database')
+
+class RankedBoard:
+    """Users ranked by completed chats, then total chat time.
+
+    Sort keys are kept in a sorted list, so rank lookups are a binary search
+    and top-K pages are a slice. Only users with at least one chat are ranked.
+    """
+
+    def __init__(self):
+        self._keys = []  # Sorted [(-total_chats, -total_time, user_id)]
+        self._totals = {}  # {user_id: (total_chats, total_time)}
+
+    def _remove(self, user_id):
+        totals = self._totals.pop(user_id, None)
+        if totals:
+            key = (-totals[0], -totals[1], user_id)
+            del self._keys[bisect_left(self._keys, key)]
+
+    def set(self, user_id, total_chats, total_time):
+        """Set a user's totals, moving them to their new rank."""
+        self._remove(user_id)
+        if total_chats > 0:
+            self._totals[user_id] = (total_chats, total_time)
+            insort(self._keys, (-total_chats, -total_time, user_id))
+
+    def add(self, user_id, chats, time):
+        """Add to a user's totals."""
+        total_chats, total_time = self._totals.get(user_id, (0, 0))
+        self.set(user_id, total_chats + chats, total_time + time)
+
+    def get(self, user_id):
+        """Get a user's (total_chats, total_time), or None if unranked."""
+        return self._totals.get(user_id)
+
+    def top(self, limit=10, offset=0):
+        """Get [(user_id, total_chats, total_time)] for a page of the ranking."""
+        return [
+            (user_id, -neg_chats, -neg_time)
+            for neg_chats, neg_time, user_id in self._keys[offset:offset + limit]
+        ]
+
+    def rank(self, user_id):
+        """Get (rank, ranked_users) for a user, or None if unranked."""
+        totals = self._totals.get(user_id)
+        if not totals:
+            return None
+        return bisect_left(self._keys, (-totals[0], -totals[1], user_id)) + 1, len(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+class Leaderboard:
+    """Global and per-server leaderboards kept in memory.
+
+    Rebuilt from the database at startup and updated as chats end, so reading
+    the leaderboard or a user's rank never scans the users table.
+    """
+
+    def __init__(self):
+        self.global_board = RankedBoard()
+        self.server_boards = {}  # {server_id: RankedBoard}
+        self.usernames = {}  # {user_id: username}
+        self.loaded = False
+
+    async def rebuild(self):
+        """Load all boards from the database."""
+        global_board = RankedBoard()
+        server_boards = {}
+        usernames = {}
+
+        async with get_pool().reader() as db:
+            cursor = await db.execute(
+                """
+                SELECT
+                    user_id,
+                    username,
+                    COALESCE(total_chats, 0) as total_chats,
+                    COALESCE(total_time, 0) as total_time
+                FROM users
+                WHERE COALESCE(total_chats, 0) > 0
+                """
+            )
+            for row in await cursor.fetchall():
+                global_board.set(row['user_id'], row['total_chats'], row['total_time'])
+                usernames[row['user_id']] = row['username']
+
+            # Per-server totals come from the history of chats started from each
+            # server's requests, counting chats the same way end_chat does
+            cursor = await db.execute(
+                """
+                SELECT
+                    cr.server_id,
+                    p.user_id,
+                    COUNT(*) as total_chats,
+                    SUM(ch.duration) as total_time
+                FROM chat_history ch
+                JOIN active_chats ac ON ch.chat_id = ac.chat_id
+                JOIN chat_requests cr ON ac.request_id = cr.request_id
+                JOIN (
+                    SELECT chat_id, user1_id as user_id FROM active_chats
+                    UNION ALL
+                    SELECT chat_id, user2_id as user_id FROM active_chats
+                ) p ON p.chat_id = ac.chat_id
+                WHERE ch.duration > 0
+                GROUP BY cr.server_id, p.user_id
+                """
+            )
+            for row in await cursor.fetchall():
+                board = server_boards.setdefault(row['server_id'], RankedBoard())
+                board.set(row['user_id'], row['total_chats'], row['total_time'])
+
+        self.global_board = global_board
+        self.server_boards = server_boards
+        self.usernames = usernames
+        self.loaded = True
+        logger.info(
+            f"Loaded leaderboard with {len(global_board)} ranked users "
+            f"across {len(server_boards)} servers"
+        )
+
+    def reset(self):
+        """Forget all boards, for when the database is closed."""
+        self.global_board = RankedBoard()
+        self.server_boards = {}
+        self.usernames = {}
+        self.loaded = False
+
+    def get_board(self, server_id=None):
+        if server_id is None:
+            return self.global_board
+        return self.server_boards.get(server_id)
+
+    def record_chat(self, server_id, participants, duration):
+        """Count a completed chat for its [(user_id, username)] participants."""
+        for user_id, username in participants:
+            self.usernames[user_id] = username
+            self.global_board.add(user_id, 1, duration)
+            if server_id is not None:
+                self.server_boards.setdefault(server_id, RankedBoard()).add(user_id, 1, duration)
+
+    def set_username(self, user_id, username):
+        """Update the name shown for a ranked user."""
+        if user_id in self.usernames:
+            self.usernames[user_id] = username
+
+    def top(self, limit=10, server_id=None):
+        """Get leaderboard entries for the top users."""
+        board = self.get_board(server_id)
+        if not board:
+            return []
+
+        return [
+            {
+                'user_id': user_id,
+                'username': self.usernames.get(user_id, str(user_id)),
+                'total_chats': total_chats,
+                'total_time': total_time
+            }
+            for user_id, total_chats, total_time in board.top(limit)
+        ]
+
+    def rank(self, user_id, server_id=None):
+        """Get (rank, ranked_users) for a user, or None if unranked."""
+        board = self.get_board(server_id)
+        if not board:
+            return None
+        return board.rank(user_id)
+
+leaderboard = Leaderboard()
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+
+from .pool import get_pool
+
+logger = logging.getLogger('coffee_bot.database')
+
+# Flush once this many messages are queued, or after this many seconds
+MESSAGE_LOG_BATCH_SIZE = int(os.getenv('MESSAGE_LOG_BATCH_SIZE', '50'))
+MESSAGE_LOG_FLUSH_INTERVAL = float(os.getenv('MESSAGE_LOG_FLUSH_INTERVAL', '1.0'))
+
+# Upper bound on queued messages kept while the database is failing
+MESSAGE_LOG_MAX_PENDING = 10000
+
+class MessageLog:
+    """Write-behind buffer for relayed chat messages.
+
+    Messages are queued in memory and written in batched transactions when
+    either the batch size or the flush interval is reached, so relaying a
+    message never waits on a commit.
+    """
+
+    def __init__(self, batch_size=MESSAGE_LOG_BATCH_SIZE, flush_interval=MESSAGE_LOG_FLUSH_INTERVAL,
+                 max_pending=MESSAGE_LOG_MAX_PENDING):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.flushed_batches = 0
+        self.flushed_messages = 0
+        self.dropped_messages = 0
+        self._pending = []
+        self._flush_event = None
+        self._stopping = False
+        self._task = None
+
+    def append(self, chat_id, sender_id, content, has_attachment=False):
+        """Queue a message to be written on the next flush."""
+        # Record the send time now since the row is written later
+        sent_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        self._pending.append((chat_id, sender_id, content, has_attachment, sent_at))
+
+        if len(self._pending) >= self.batch_size and self._flush_event is not None:
+            self._flush_event.set()
+
+    async def flush(self):
+        """Write all queued messages in a single transaction."""
+        if not self._pending:
+            return 0
+
+        batch, self._pending = self._pending, []
+
+        try:
+            async with get_pool().writer() as db:
+                await db.executemany(
+                    """
+                    INSERT INTO messages
+                        (chat_id, sender_id, content, has_attachment, sent_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    batch
+                )
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Error flushing {len(batch)} queued messages: {e}")
+
+            # Put the batch back in front of anything queued meanwhile
+            self._pending[:0] = batch
+            overflow = len(self._pending) - self.max_pending
+            if overflow > 0:
+                del self._pending[:overflow]
+                self.dropped_messages += overflow
+                logger.error(f"Dropped {overflow} queued messages after repeated flush failures")
+            return 0
+
+        self.flushed_batches += 1
+        self.flushed_messages += len(batch)
+        return len(batch)
+
+    def start(self):
+        """Start the background flush task."""
+        if self._task is not None:
+            return
+
+        self._flush_event = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._flush_loop())
+        logger.info(
+            f"Started message log (batch size {self.batch_size}, "
+            f"flush interval {self.flush_interval}s)"
+        )
+
+    async def stop(self):
+        """Stop the background task and flush anything still queued."""
+        if self._task is not None:
+            # Let the loop finish its current flush instead of cancelling it mid-write
+            self._stopping = True
+            self._flush_event.set()
+            await self._task
+            self._task = None
+
+        await self.flush()
+        logger.info(f"Stopped message log ({self.flushed_messages} messages written)")
+
+    async def _flush_loop(self):
+        """Background task that flushes on the size or time threshold."""
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+            self._flush_event.clear()
+            if self._stopping:
+                break
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error in message log flush loop: {e}")
+
+    def get_metrics(self):
+        """Return queue and flush counters."""
+        return {
+            'pending': len(self._pending),
+            'flushed_batches': self.flushed_batches,
+            'flushed_messages': self.flushed_messages,
+            'dropped_messages': self.dropped_messages
+        }
+
+message_log = MessageLog()
+
+def log_message(chat_id, sender_id, content, has_attachment=False):
+    """Queue a relayed message to be saved without waiting for the write."""
+    message_log.append(chat_id, sender_id, content, has_attachment)
@@ -0,0 +1,79 @@
+from bisect import bisect_left
+
+class WaitStats:
+    """Running statistics for time spent waiting on a shared resource."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        """Record a single wait, in seconds."""
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def snapshot(self):
+        """Return the current statistics in milliseconds."""
+        return {
+            'count': self.count,
+            'total_ms': round(self.total * 1000, 3),
+            'avg_ms': round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max * 1000, 3)
+        }
+
+class LatencyHistogram:
+    """Latency distribution kept in fixed buckets, for percentile estimates.
+
+    Percentiles are reported as the upper bound of the bucket they fall in,
+    so they are never lower than the true value.
+    """
+
+    # Bucket upper bounds in milliseconds; the last bucket is unbounded
+    BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 3000, 5000)
+
+    def __init__(self, bounds_ms=BOUNDS_MS):
+        self.bounds_ms = bounds_ms
+        self.counts = [0] * (len(bounds_ms) + 1)
+        self.count = 0
+        self.max = 0.0
+
+    def record(self, seconds):
+        """Record a single latency, in seconds."""
+        ms = seconds * 1000.0
+        index = bisect_left(self.bounds_ms, ms)
+        self.counts[index] += 1
+        self.count += 1
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, percent):
+        """Estimate a percentile in milliseconds, or 0.0 with no samples."""
+        if not self.count:
+            return 0.0
+
+        rank = self.count * percent / 100
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                if index < len(self.bounds_ms):
+                    return float(min(self.bounds_ms[index], self.max))
+                return round(self.max, 3)
+        return round(self.max, 3)
+
+    def snapshot(self):
+        """Return the sample count, percentiles and bucket counts in milliseconds."""
+        return {
+            'count': self.count,
+            'p50_ms': self.percentile(50),
+            'p90_ms': self.percentile(90),
+            'p99_ms': self.percentile(99),
+            'max_ms': round(self.max, 3),
+            'buckets': {
+                (f"<={bound}ms" if index < len(self.bounds_ms) else f">{self.bounds_ms[-1]}ms"): count
+                for index, (bound, count) in enumerate(zip(self.bounds_ms + (None,), self.counts))
+            }
+        }
@@ -0,0 +1,105 @@
+import logging
+import re
+from pathlib import Path
+
+logger = logging.getLogger('coffee_bot.database')
+
+MIGRATIONS_DIR = Path(__file__).parent / 'migrations'
+
+# Migration files are named <version>_<name>.sql and applied in version order
+MIGRATION_FILE_PATTERN = re.compile(r'^(\d+)_(\w+)\.sql$')
+INDEX_PATTERN = re.compile(r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)', re.IGNORECASE)
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """Load migration files as a list of (version, name, sql) sorted by version."""
+    migrations = []
+    seen_versions = set()
+
+    for path in directory.iterdir():
+        match = MIGRATION_FILE_PATTERN.match(path.name)
+        if not match:
+            continue
+
+        version = int(match.group(1))
+        if version in seen_versions:
+            raise RuntimeError(f"Duplicate migration version {version} in {directory}")
+        seen_versions.add(version)
+
+        migrations.append((version, match.group(2), path.read_text()))
+
+    migrations.sort(key=lambda migration: migration[0])
+    return migrations
+
+def get_expected_indexes(migrations):
+    """Get the names of all indexes created by the given migrations."""
+    indexes = []
+    for _, _, sql in migrations:
+        indexes.extend(INDEX_PATTERN.findall(sql))
+    return indexes
+
+async def get_schema_version(db):
+    """Get the highest migration version applied to the database."""
+    cursor = await db.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    result = await cursor.fetchone()
+    return result[0]
+
+async def run_migrations(db, migrations=None):
+    """Apply all migrations that have not been applied yet.
+
+    Each migration runs in its own transaction together with the insert into
+    schema_version, so a failed migration leaves no partial changes behind.
+    """
+    if migrations is None:
+        migrations = load_migrations()
+
+    await db.execute('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    await db.commit()
+
+    cursor = await db.execute("SELECT version FROM schema_version")
+    applied = {row[0] for row in await cursor.fetchall()}
+
+    for version, name, sql in migrations:
+        if version in applied:
+            continue
+
+        logger.info(f"Applying database migration {version:04d}_{name}")
+        try:
+            await db.executescript(
+                f"BEGIN;\n{sql}\n"
+                f"INSERT INTO schema_version (version, name) VALUES ({version}, '{name}');\n"
+                "COMMIT;"
+            )
+        except Exception:
+            if db.in_transaction:
+                await db.rollback()
+            logger.error(f"Database migration {version:04d}_{name} failed")
+            raise
+
+    version = await get_schema_version(db)
+    logger.info(f"Database schema is at version {version}")
+    return version
+
+async def verify_indexes(db, migrations=None):
+    """Check that every index created by the migrations exists.
+
+    Returns the list of missing index names.
+    """
+    if migrations is None:
+        migrations = load_migrations()
+
+    cursor = await db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    existing = {row[0] for row in await cursor.fetchall()}
+
+    missing = [name for name in get_expected_indexes(migrations) if name not in existing]
+    if missing:
+        logger.error(f"Database is missing expected indexes: {', '.join(missing)}")
+    else:
+        logger.info("All expected database indexes are present")
+
+    return missing
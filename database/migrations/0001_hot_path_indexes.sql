@@ -0,0 +1,30 @@
+-- Indexes for the queries that run on every menu open and relayed message.
+
+-- get_pending_requests: WHERE status = 'pending' ORDER BY created_at, request_id
+-- (user_id is included so excluding a user's own requests needs no table lookup)
+CREATE INDEX IF NOT EXISTS idx_chat_requests_pending
+    ON chat_requests (created_at, request_id, user_id)
+    WHERE status = 'pending';
+
+-- get_user_request: WHERE user_id = ? AND status = 'pending'
+CREATE INDEX IF NOT EXISTS idx_chat_requests_user_status
+    ON chat_requests (user_id, status);
+
+-- get_active_chat: WHERE (user1_id = ? OR user2_id = ?) AND status = 'active'
+-- (one index per column so SQLite can answer the OR with two index seeks)
+CREATE INDEX IF NOT EXISTS idx_active_chats_user1_status
+    ON active_chats (user1_id, status);
+
+CREATE INDEX IF NOT EXISTS idx_active_chats_user2_status
+    ON active_chats (user2_id, status);
+
+-- Joins from a request to its chat and from a chat to its history
+CREATE INDEX IF NOT EXISTS idx_active_chats_request
+    ON active_chats (request_id);
+
+CREATE INDEX IF NOT EXISTS idx_chat_history_chat
+    ON chat_history (chat_id);
+
+-- Message lookups by chat
+CREATE INDEX IF NOT EXISTS idx_messages_chat
+    ON messages (chat_id, sent_at);
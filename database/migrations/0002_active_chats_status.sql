@@ -0,0 +1,7 @@
+-- Index for loading every active chat at startup.
+
+-- get_active_chats: WHERE status = 'active'
+-- (the partial index only holds chats that are still active)
+CREATE INDEX IF NOT EXISTS idx_active_chats_active
+    ON active_chats (chat_id, request_id, user1_id, user2_id, started_at)
+    WHERE status = 'active';
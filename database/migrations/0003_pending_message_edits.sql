@@ -0,0 +1,10 @@
+-- Request message edits that have been scheduled but not applied yet, so a
+-- restart doesn't lose the latest state of a message.
+CREATE TABLE IF NOT EXISTS pending_message_edits (
+    message_id INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL,
+    embed TEXT NOT NULL,
+    accept_request_id INTEGER,
+    version INTEGER NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import os
+
+from .pool import get_pool
+
+logger = logging.getLogger('coffee_bot.database')
+
+# How often the in-process count is checked against the database, in seconds
+PENDING_RECONCILE_INTERVAL = float(os.getenv('PENDING_RECONCILE_INTERVAL', '600'))
+
+class PendingRequestCounter:
+    """In-process count of pending chat requests, kept per requesting user.
+
+    Request operations update the counter as requests enter and leave the
+    pending state, so counting never has to touch the database. The counts
+    are periodically reconciled with a COUNT(*) to correct any drift.
+    """
+
+    def __init__(self, reconcile_interval=PENDING_RECONCILE_INTERVAL):
+        self.reconcile_interval = reconcile_interval
+        self.total = 0
+        self.loaded = False
+        self.reconciliations = 0
+        self.drift_corrections = 0
+        self._by_user = {}  # {user_id: pending request count}
+        self._task = None
+
+    def add(self, user_id):
+        """Record a request entering the pending state."""
+        self.total += 1
+        self._by_user[user_id] = self._by_user.get(user_id, 0) + 1
+
+    def remove(self, user_id):
+        """Record a request leaving the pending state."""
+        count = self._by_user.get(user_id, 0)
+        if count <= 0:
+            return
+
+        self.total -= 1
+        if count == 1:
+            del self._by_user[user_id]
+        else:
+            self._by_user[user_id] = count - 1
+
+    def count(self, exclude_user_id=None):
+        """Get the number of pending requests, optionally excluding a user's own."""
+        if exclude_user_id:
+            return self.total - self._by_user.get(exclude_user_id, 0)
+        return self.total
+
+    async def reconcile(self):
+        """Reload the counts from the database.
+
+        This runs on the writer connection so no request can change state
+        between the COUNT(*) and replacing the in-process counts.
+        """
+        async with get_pool().writer() as db:
+            cursor = await db.execute(
+                """
+                SELECT user_id, COUNT(*)
+                FROM chat_requests
+                WHERE status = 'pending'
+                GROUP BY user_id
+                """
+            )
+            by_user = {user_id: count for user_id, count in await cursor.fetchall()}
+
+            if self.loaded and by_user != self._by_user:
+                self.drift_corrections += 1
+                logger.warning(
+                    f"Pending request counter drifted: counted {self.total}, "
+                    f"database has {sum(by_user.values())}"
+                )
+
+            self._by_user = by_user
+            self.total = sum(by_user.values())
+            self.loaded = True
+            self.reconciliations += 1
+
+        return self.total
+
+    def reset(self):
+        """Forget all counts, for when the database is closed."""
+        self.total = 0
+        self.loaded = False
+        self._by_user = {}
+
+    def start(self):
+        """Start the periodic reconciliation task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._reconcile_loop())
+
+    async def stop(self):
+        """Stop the periodic reconciliation task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _reconcile_loop(self):
+        """Background task that reconciles the counts on an interval."""
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.error(f"Error reconciling pending request counter: {e}")
+
+pending_counter = PendingRequestCounter()
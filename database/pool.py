@@ -0,0 +1,196 @@
+import aiosqlite
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+from .metrics import WaitStats
+from .profile import get_profile, apply_profile, read_settings
+
+logger = logging.getLogger('coffee_bot.database')
+
+# Number of reader connections; writes always go through a single connection
+DEFAULT_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '4'))
+
+class ConnectionPool:
+    """Long-lived aiosqlite connections shared by all database operations.
+
+    SQLite only allows one writer at a time, so writes are serialized through a
+    dedicated writer connection while reads are spread over a pool of readers.
+    """
+
+    def __init__(self, db_path, pool_size=DEFAULT_POOL_SIZE, profile=None):
+        self.db_path = db_path
+        self.pool_size = max(1, int(pool_size))
+        self.profile = get_profile(profile)
+        self.checkpoints = 0
+        self._checkpoint_task = None
+        self.reader_wait = WaitStats()
+        self.writer_wait = WaitStats()
+        self._readers = None
+        self._writer = None
+        self._writer_lock = None
+        self._connections = []
+
+    @property
+    def is_open(self):
+        return self._writer is not None
+
+    async def _connect(self):
+        db = await aiosqlite.connect(self.db_path)
+        db.row_factory = aiosqlite.Row
+        self._connections.append(db)
+        await apply_profile(db, self.profile)
+        return db
+
+    async def open(self):
+        """Open the writer connection and all reader connections."""
+        if self.is_open:
+            return
+
+        self._readers = asyncio.Queue()
+        self._writer_lock = asyncio.Lock()
+
+        try:
+            self._writer = await self._connect()
+            for _ in range(self.pool_size):
+                self._readers.put_nowait(await self._connect())
+        except Exception:
+            await self.close()
+            raise
+
+        settings = await read_settings(self._writer)
+        logger.info(
+            f"Opened database pool with 1 writer and {self.pool_size} reader connections "
+            f"using the '{self.profile['name']}' profile: "
+            + ", ".join(f"{pragma}={value}" for pragma, value in settings.items())
+        )
+
+        if self.profile['checkpoint_interval'] > 0 and settings['journal_mode'].lower() == 'wal':
+            self._checkpoint_task = asyncio.create_task(self._checkpoint_loop())
+
+    async def close(self):
+        """Close every connection owned by the pool."""
+        if self._checkpoint_task is not None:
+            self._checkpoint_task.cancel()
+            try:
+                await self._checkpoint_task
+            except asyncio.CancelledError:
+                pass
+            self._checkpoint_task = None
+
+        # Fold the WAL back into the database file so it starts small next time
+        if self._writer is not None and self.profile['journal_mode'].lower() == 'wal':
+            try:
+                await self.checkpoint('TRUNCATE')
+            except Exception as e:
+                logger.error(f"Error checkpointing database on close: {e}")
+
+        connections, self._connections = self._connections, []
+        self._writer = None
+        self._readers = None
+
+        for db in connections:
+            try:
+                await db.close()
+            except Exception as e:
+                logger.error(f"Error closing database connection: {e}")
+
+        if connections:
+            logger.info("Closed database pool")
+
+    @asynccontextmanager
+    async def reader(self):
+        """Borrow a read-only connection from the pool."""
+        start = time.perf_counter()
+        db = await self._readers.get()
+        self.reader_wait.record(time.perf_counter() - start)
+
+        try:
+            yield db
+        finally:
+            # The pool may have been closed while the connection was borrowed
+            if self._readers is not None:
+                self._readers.put_nowait(db)
+
+    @asynccontextmanager
+    async def writer(self):
+        """Borrow the writer connection, rolling back on errors."""
+        start = time.perf_counter()
+        async with self._writer_lock:
+            self.writer_wait.record(time.perf_counter() - start)
+            db = self._writer
+
+            try:
+                yield db
+            except BaseException:
+                if db.in_transaction:
+                    await db.rollback()
+                raise
+
+    async def checkpoint(self, mode=None):
+        """Checkpoint the WAL into the database file.
+
+        Returns (busy, wal_pages, checkpointed_pages) as reported by SQLite.
+        """
+        mode = mode or self.profile['checkpoint_mode']
+        async with self.writer() as db:
+            cursor = await db.execute(f"PRAGMA wal_checkpoint({mode})")
+            result = tuple(await cursor.fetchone())
+
+        self.checkpoints += 1
+        logger.debug(f"WAL checkpoint ({mode}): {result}")
+        return result
+
+    async def _checkpoint_loop(self):
+        """Background task that checkpoints the WAL on the profile's interval."""
+        while True:
+            await asyncio.sleep(self.profile['checkpoint_interval'])
+            try:
+                await self.checkpoint()
+            except Exception as e:
+                logger.error(f"Error checkpointing database: {e}")
+
+    def get_metrics(self):
+        """Return pool size and wait-time metrics."""
+        return {
+            'profile': self.profile['name'],
+            'checkpoints': self.checkpoints,
+            'pool_size': self.pool_size,
+            'readers_available': self._readers.qsize() if self._readers is not None else 0,
+            'reader_wait': self.reader_wait.snapshot(),
+            'writer_wait': self.writer_wait.snapshot()
+        }
+
+_pool = None
+
+async def open_pool(db_path, pool_size=DEFAULT_POOL_SIZE, profile=None):
+    """Open the shared connection pool."""
+    global _pool
+    if _pool is not None and _pool.is_open:
+        return _pool
+
+    pool = ConnectionPool(db_path, pool_size, profile)
+    await pool.open()
+    _pool = pool
+    return _pool
+
+async def close_pool():
+    """Close the shared connection pool if it is open."""
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.close()
+
+def get_pool():
+    """Get the shared connection pool."""
+    if _pool is None:
+        raise RuntimeError("Database pool is not open; call initialize_database() first")
+    return _pool
+
+def get_pool_metrics():
+    """Get wait-time metrics for the shared connection pool."""
+    if _pool is None:
+        return None
+    return _pool.get_metrics()
@@ -0,0 +1,96 @@
+import logging
+import os
+
+logger = logging.getLogger('coffee_bot.database')
+
+# SQLite settings applied to every pooled connection. Negative cache_size values
+# are in KiB, mmap_size is in bytes and busy_timeout is in milliseconds.
+# checkpoint_interval is how often (in seconds) the WAL is checkpointed in the
+# background; 0 leaves checkpointing to SQLite's wal_autocheckpoint alone.
+PERFORMANCE_PROFILES = {
+    # WAL with NORMAL sync: readers never block the writer and commits skip the
+    # per-transaction fsync (the WAL is still fsynced at every checkpoint)
+    'balanced': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+        'wal_autocheckpoint': 1000,
+        'checkpoint_interval': 300,
+        'checkpoint_mode': 'PASSIVE'
+    },
+    # WAL with FULL sync: every commit is durable across power loss
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -16000,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+        'wal_autocheckpoint': 1000,
+        'checkpoint_interval': 300,
+        'checkpoint_mode': 'PASSIVE'
+    },
+    # SQLite's defaults (rollback journal), kept for comparison
+    'legacy': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'cache_size': -2000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 5000,
+        'wal_autocheckpoint': 1000,
+        'checkpoint_interval': 0,
+        'checkpoint_mode': 'PASSIVE'
+    }
+}
+
+DEFAULT_PROFILE = os.getenv('DB_PROFILE', 'balanced')
+
+# PRAGMAs applied to each connection, in the order they are applied
+CONNECTION_PRAGMAS = (
+    'busy_timeout',
+    'journal_mode',
+    'synchronous',
+    'cache_size',
+    'mmap_size',
+    'temp_store',
+    'wal_autocheckpoint'
+)
+
+def get_profile(profile=None):
+    """Resolve a profile name or settings dict to a complete settings dict.
+
+    A dict may override only some settings of the default profile.
+    """
+    if profile is None:
+        profile = DEFAULT_PROFILE
+
+    if isinstance(profile, str):
+        if profile not in PERFORMANCE_PROFILES:
+            raise ValueError(
+                f"Unknown database profile '{profile}' "
+                f"(expected one of: {', '.join(PERFORMANCE_PROFILES)})"
+            )
+        return dict(PERFORMANCE_PROFILES[profile], name=profile)
+
+    settings = dict(PERFORMANCE_PROFILES['balanced'], name='custom')
+    settings.update(profile)
+    return settings
+
+async def apply_profile(db, profile):
+    """Apply the connection PRAGMAs of a profile to a connection."""
+    for pragma in CONNECTION_PRAGMAS:
+        # PRAGMA values cannot be bound as parameters
+        await db.execute(f"PRAGMA {pragma} = {profile[pragma]}")
+
+async def read_settings(db):
+    """Read back the PRAGMA values actually in effect on a connection."""
+    settings = {}
+    for pragma in CONNECTION_PRAGMAS:
+        cursor = await db.execute(f"PRAGMA {pragma}")
+        result = await cursor.fetchone()
+        settings[pragma] = result[0] if result else None
+    return settings
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Add the repository root to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from database import db_operations
+from database.db_operations import (
+    accept_request,
+    abort_chat,
+    create_chat_request,
+    end_chat,
+    get_active_chat,
+    get_or_create_server,
+    get_or_create_user,
+    get_request_by_id,
+    ACCEPT_ACCEPTED,
+    ACCEPT_NOT_FOUND,
+    ACCEPT_NOT_PENDING,
+    ACCEPT_OWN_REQUEST,
+    ACCEPT_IN_CHAT,
+)
+from database.db_setup import create_tables, migrate_database
+from database.pool import open_pool, close_pool, get_pool
+
+@pytest.fixture
+def run_with_db(tmp_path):
+    """Run a coroutine function against a fresh database with users 1-4 and server 1."""
+    def run(test):
+        async def main():
+            await open_pool(tmp_path / 'test.db', 2)
+            try:
+                await create_tables()
+                await migrate_database()
+                for user_id in range(1, 5):
+                    await get_or_create_user(user_id, f"user{user_id}")
+                await get_or_create_server(1, "server1")
+                await test()
+            finally:
+                await close_pool()
+                db_operations.clear_caches()
+        asyncio.run(main())
+    return run
+
+def test_concurrent_accepts_have_one_winner(run_with_db):
+    async def test():
+        request = await create_chat_request(1, 1, "Topic", None)
+        results = await asyncio.gather(
+            accept_request(request['request_id'], 2),
+            accept_request(request['request_id'], 3),
+            accept_request(request['request_id'], 4)
+        )
+
+        statuses = sorted(result.status for result in results)
+        assert statuses == [ACCEPT_ACCEPTED, ACCEPT_NOT_PENDING, ACCEPT_NOT_PENDING]
+
+        winner = next(result for result in results if result.accepted)
+        assert winner.chat['user1_id'] == 1
+        assert (await get_active_chat(winner.chat['user2_id']))['chat_id'] == winner.chat['chat_id']
+        assert (await get_request_by_id(request['request_id']))['status'] == 'accepted'
+    run_with_db(test)
+
+def test_lost_race_reports_why(run_with_db):
+    async def test():
+        request = await create_chat_request(1, 1, "Topic", None)
+        assert (await accept_request(request['request_id'], 1)).status == ACCEPT_OWN_REQUEST
+        assert (await accept_request(request['request_id'], 2)).accepted
+
+        lost = await accept_request(request['request_id'], 3)
+        assert lost.status == ACCEPT_NOT_PENDING
+        assert lost.request['status'] == 'accepted'
+        assert lost.chat is None
+
+        assert (await accept_request(12345, 3)).status == ACCEPT_NOT_FOUND
+
+        # The accepter is now in a chat, so can't accept another request
+        other = await create_chat_request(3, 1, "Other topic", None)
+        assert (await accept_request(other['request_id'], 2)).status == ACCEPT_IN_CHAT
+    run_with_db(test)
+
+def test_accept_cancels_accepters_own_request(run_with_db):
+    async def test():
+        request = await create_chat_request(1, 1, "Topic", None)
+        own_request = await create_chat_request(2, 1, "My topic", None)
+
+        result = await accept_request(request['request_id'], 2)
+        assert result.accepted
+        assert result.cancelled_request['request_id'] == own_request['request_id']
+        assert (await get_request_by_id(own_request['request_id']))['status'] == 'cancelled'
+        assert await db_operations.get_pending_request_count() == 0
+    run_with_db(test)
+
+def test_ending_unknown_chat_leaves_no_open_transaction(run_with_db):
+    async def test():
+        assert await end_chat(999) is None
+        assert await abort_chat(999, 1) is None
+        assert not get_pool()._writer.in_transaction
+
+        request = await create_chat_request(1, 1, "Topic", None)
+        assert (await accept_request(request['request_id'], 2)).accepted
+    run_with_db(test)
+
+def test_abort_requeues_request_unless_requester_unreachable(run_with_db):
+    async def test():
+        request = await create_chat_request(1, 1, "Topic", None)
+        result = await accept_request(request['request_id'], 2)
+        assert await db_operations.get_pending_request_count() == 0
+
+        # The accepter can't be reached, so the requester keeps their request
+        requeued = await abort_chat(result.chat['chat_id'], 2)
+        assert requeued['status'] == 'pending'
+        assert await db_operations.get_pending_request_count() == 1
+
+        # It can be accepted again, and reports its latest chat
+        result = await accept_request(request['request_id'], 3)
+        assert result.accepted
+        assert (await get_request_by_id(request['request_id']))['responder_id'] == 3
+
+        # The requester can't be reached, so the request is cancelled
+        cancelled = await abort_chat(result.chat['chat_id'], 1)
+        assert cancelled['status'] == 'cancelled'
+        assert await db_operations.get_pending_request_count() == 0
+    run_with_db(test)
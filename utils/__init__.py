@@ -3,6 +3,8 @@ from .ui import (
     CoffeeChatRequestModal,
     RequestListView,
     ChatView,
+    AcceptRequestButton,
+    create_accept_view,
     create_request_embed,
     create_completed_request_embed,
     create_stats_embed,
@@ -15,6 +17,8 @@ __all__ = [
     'CoffeeChatRequestModal',
     'RequestListView',
     'ChatView',
+    'AcceptRequestButton',
+    'create_accept_view',
     'create_request_embed',
     'create_completed_request_embed',
     'create_stats_embed',
@@ -0,0 +1,139 @@
+import aiohttp
+import asyncio
+import discord
+import io
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger('coffee_bot.attachments')
+
+# Files larger than this many bytes are spooled to a temporary file on disk
+ATTACHMENT_MEMORY_THRESHOLD = int(os.getenv('ATTACHMENT_MEMORY_THRESHOLD', str(1024 * 1024)))
+# Most bytes re-uploaded for a single message; further attachments are sent as links
+ATTACHMENT_MESSAGE_BUDGET = int(os.getenv('ATTACHMENT_MESSAGE_BUDGET', str(8 * 1024 * 1024)))
+# Most attachment bytes held by the whole process at once
+ATTACHMENT_MAX_IN_FLIGHT = int(os.getenv('ATTACHMENT_MAX_IN_FLIGHT', str(64 * 1024 * 1024)))
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+class PreparedAttachments:
+    """Attachments of one message, ready to send."""
+
+    __slots__ = ('files', 'links', 'reserved_bytes')
+
+    def __init__(self):
+        self.files = []  # discord.File objects to re-upload
+        self.links = []  # [(filename, url)] sent as links instead
+        self.reserved_bytes = 0
+
+class AttachmentRelay:
+    """Downloads message attachments for re-upload without buffering them whole.
+
+    All attachments of a message are streamed concurrently. Small files stay in
+    memory while larger ones spool to temporary files, and attachments that
+    would exceed the per-message or per-process byte budget are sent as links.
+    """
+
+    def __init__(self, memory_threshold=ATTACHMENT_MEMORY_THRESHOLD,
+                 message_budget=ATTACHMENT_MESSAGE_BUDGET, max_in_flight=ATTACHMENT_MAX_IN_FLIGHT):
+        self.memory_threshold = memory_threshold
+        self.message_budget = message_budget
+        self.max_in_flight = max_in_flight
+        self.bytes_in_flight = 0
+        self.peak_bytes_in_flight = 0
+        self.files_relayed = 0
+        self.links_relayed = 0
+        self.download_failures = 0
+        self._session = None
+
+    def _reserve(self, size):
+        self.bytes_in_flight += size
+        self.peak_bytes_in_flight = max(self.peak_bytes_in_flight, self.bytes_in_flight)
+
+    async def prepare(self, attachments):
+        """Download a message's attachments, returning PreparedAttachments."""
+        prepared = PreparedAttachments()
+        to_download = []
+        budget = self.message_budget
+
+        # Decide up front which attachments fit in the budgets, keeping their order
+        for attachment in attachments:
+            if attachment.size <= budget and self.bytes_in_flight + attachment.size <= self.max_in_flight:
+                budget -= attachment.size
+                self._reserve(attachment.size)
+                prepared.reserved_bytes += attachment.size
+                to_download.append(attachment)
+            else:
+                prepared.links.append((attachment.filename, attachment.url))
+
+        try:
+            results = await asyncio.gather(
+                *[self._download(attachment) for attachment in to_download],
+                return_exceptions=True
+            )
+        except BaseException:
+            self.release(prepared)
+            raise
+
+        for attachment, result in zip(to_download, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to download attachment {attachment.filename}: {result}")
+                self.download_failures += 1
+                prepared.links.append((attachment.filename, attachment.url))
+            else:
+                prepared.files.append(result)
+
+        self.files_relayed += len(prepared.files)
+        self.links_relayed += len(prepared.links)
+        return prepared
+
+    async def _download(self, attachment):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+
+        # The size is known up front, so pick the buffer once. discord.File needs
+        # an io.IOBase, which SpooledTemporaryFile isn't before Python 3.11.
+        if attachment.size <= self.memory_threshold:
+            buffer = io.BytesIO()
+        else:
+            buffer = tempfile.TemporaryFile()
+
+        try:
+            async with self._session.get(attachment.url) as response:
+                response.raise_for_status()
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    buffer.write(chunk)
+
+            buffer.seek(0)
+            return discord.File(buffer, filename=attachment.filename, spoiler=attachment.is_spoiler())
+        except BaseException:
+            buffer.close()
+            raise
+
+    def release(self, prepared):
+        """Close the downloaded files and return their bytes to the budget."""
+        for file in prepared.files:
+            # File.close() only restores fp.close for file objects it didn't open
+            file.close()
+            file.fp.close()
+        prepared.files = []
+
+        self.bytes_in_flight -= prepared.reserved_bytes
+        prepared.reserved_bytes = 0
+
+    async def close(self):
+        """Close the HTTP session used for downloads."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def get_metrics(self):
+        """Return bytes-in-flight and relay counters."""
+        return {
+            'bytes_in_flight': self.bytes_in_flight,
+            'peak_bytes_in_flight': self.peak_bytes_in_flight,
+            'files_relayed': self.files_relayed,
+            'links_relayed': self.links_relayed,
+            'download_failures': self.download_failures
+        }
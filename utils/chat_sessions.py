@@ -0,0 +1,74 @@
+import sys
+
+class ChatSession:
+    """An active chat between two users."""
+
+    __slots__ = ('chat_id', 'user1_id', 'user2_id', 'start_time')
+
+    def __init__(self, chat_id, user1_id, user2_id, start_time):
+        self.chat_id = chat_id
+        self.user1_id = user1_id
+        self.user2_id = user2_id
+        self.start_time = start_time
+
+    def partner_of(self, user_id):
+        """Get the ID of the other user in the chat."""
+        return self.user2_id if user_id == self.user1_id else self.user1_id
+
+class ChatRegistry:
+    """Active chat sessions indexed by both participants and by chat ID.
+
+    Each chat is stored once, as a single ChatSession shared by both index
+    entries, so adding or removing a chat keeps both users in sync.
+    """
+
+    def __init__(self):
+        self._by_user = {}  # {user_id: ChatSession}
+        self._by_chat = {}  # {chat_id: ChatSession}
+
+    def add(self, session):
+        """Register a session, replacing any earlier sessions of its users."""
+        for user_id in (session.user1_id, session.user2_id):
+            previous = self._by_user.get(user_id)
+            if previous is not None:
+                self.remove(previous)
+
+        self._by_chat[session.chat_id] = session
+        self._by_user[session.user1_id] = session
+        self._by_user[session.user2_id] = session
+
+    def remove(self, session):
+        """Unregister a session if it is still registered."""
+        if self._by_chat.get(session.chat_id) is not session:
+            return False
+
+        del self._by_chat[session.chat_id]
+        for user_id in (session.user1_id, session.user2_id):
+            if self._by_user.get(user_id) is session:
+                del self._by_user[user_id]
+        return True
+
+    def get(self, user_id):
+        """Get a user's session, or None if they aren't in a chat."""
+        return self._by_user.get(user_id)
+
+    def get_chat(self, chat_id):
+        """Get a session by chat ID, or None."""
+        return self._by_chat.get(chat_id)
+
+    def __contains__(self, user_id):
+        return user_id in self._by_user
+
+    def __len__(self):
+        return len(self._by_chat)
+
+    def __iter__(self):
+        return iter(list(self._by_chat.values()))
+
+    def memory_usage(self):
+        """Return the session count and approximate bytes used by the registry."""
+        session_bytes = sum(sys.getsizeof(session) for session in self._by_chat.values())
+        return {
+            'sessions': len(self._by_chat),
+            'bytes': sys.getsizeof(self._by_user) + sys.getsizeof(self._by_chat) + session_bytes
+        }
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import os
+import time
+
+from database import save_pending_edit, delete_pending_edit, get_pending_edits
+
+logger = logging.getLogger('coffee_bot.edit_debouncer')
+
+# Seconds a message must go without new states before its edit is applied
+REQUEST_EDIT_DELAY = float(os.getenv('REQUEST_EDIT_DELAY', '2.0'))
+# Most seconds an edit can be put off by newer states
+REQUEST_EDIT_MAX_DELAY = float(os.getenv('REQUEST_EDIT_MAX_DELAY', '10.0'))
+
+class PendingEdit:
+    """The latest state scheduled for a message."""
+
+    __slots__ = ('channel_id', 'message_id', 'embed', 'accept_request_id', 'version', 'first_scheduled', 'timer')
+
+    def __init__(self, channel_id, message_id, embed, accept_request_id, version):
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.embed = embed  # Embed as a dict, so it can be stored
+        self.accept_request_id = accept_request_id  # Request to show an accept button for, if any
+        self.version = version
+        self.first_scheduled = time.monotonic()
+        self.timer = None
+
+class EditDebouncer:
+    """Coalesces the edits of each message into one, applied after a quiet period.
+
+    Scheduling a state replaces any state still waiting for the same message
+    and restarts its quiet period, up to a maximum delay. Pending states are
+    stored in the database until applied, so restore() can finish them after
+    a restart.
+    """
+
+    def __init__(self, apply, delay=REQUEST_EDIT_DELAY, max_delay=REQUEST_EDIT_MAX_DELAY):
+        self.apply = apply  # async apply(PendingEdit)
+        self.delay = delay
+        self.max_delay = max_delay
+        self.scheduled = 0
+        self.coalesced = 0
+        self.applied = 0
+        self._pending = {}  # {message_id: PendingEdit}
+
+    async def schedule(self, channel_id, message_id, embed, accept_request_id=None):
+        """Schedule the latest state of a message."""
+        version = time.time_ns()
+        edit = PendingEdit(channel_id, message_id, embed, accept_request_id, version)
+
+        previous = self._pending.get(message_id)
+        if previous is not None:
+            # Only the newest state will be applied
+            previous.timer.cancel()
+            edit.first_scheduled = previous.first_scheduled
+            self.coalesced += 1
+
+        self._pending[message_id] = edit
+        self.scheduled += 1
+        self._start_timer(edit, self.delay)
+
+        try:
+            await save_pending_edit(message_id, channel_id, embed, accept_request_id, version)
+        except Exception as e:
+            logger.error(f"Error saving pending edit of message {message_id}: {e}")
+
+    def _start_timer(self, edit, delay):
+        delay = max(0.0, min(delay, edit.first_scheduled + self.max_delay - time.monotonic()))
+        edit.timer = asyncio.create_task(self._apply_later(edit, delay))
+
+    async def _apply_later(self, edit, delay):
+        await asyncio.sleep(delay)
+        if self._pending.get(edit.message_id) is edit:
+            del self._pending[edit.message_id]
+
+        try:
+            await self.apply(edit)
+            self.applied += 1
+        except Exception as e:
+            logger.error(f"Error applying edit of message {edit.message_id}: {e}")
+
+        try:
+            await delete_pending_edit(edit.message_id, edit.version)
+        except Exception as e:
+            logger.error(f"Error removing pending edit of message {edit.message_id}: {e}")
+
+    async def restore(self):
+        """Schedule the edits that were still pending when the bot last stopped."""
+        restored = 0
+        for row in await get_pending_edits():
+            if row['message_id'] in self._pending:
+                continue
+
+            edit = PendingEdit(
+                row['channel_id'], row['message_id'], row['embed'],
+                row['accept_request_id'], row['version']
+            )
+            self._pending[edit.message_id] = edit
+            self._start_timer(edit, 0)
+            restored += 1
+
+        if restored:
+            logger.info(f"Restored {restored} pending request message edits")
+        return restored
+
+    async def close(self):
+        """Stop waiting edits; they stay stored and are restored on the next start."""
+        for edit in self._pending.values():
+            edit.timer.cancel()
+        self._pending.clear()
+
+    def get_metrics(self):
+        """Return pending, scheduled, coalesced and applied edit counts."""
+        return {
+            'pending': len(self._pending),
+            'scheduled': self.scheduled,
+            'coalesced': self.coalesced,
+            'applied': self.applied
+        }
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from database.metrics import WaitStats
+
+logger = logging.getLogger('coffee_bot.locks')
+
+# Order locks are taken in: requests, then users, then chats. A task never
+# waits for a lock that comes earlier in this order than one it holds; holds
+# with wait=False never wait, so they can be taken in any order.
+KEY_ORDER = {'request': 0, 'user': 1, 'chat': 2}
+
+def request_key(request_id):
+    return ('request', int(request_id))
+
+def user_key(user_id):
+    return ('user', int(user_id))
+
+def chat_key(chat_id):
+    return ('chat', int(chat_id))
+
+class _KeyedLock:
+    __slots__ = ('lock', 'refs')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.refs = 0  # Tasks holding or waiting for the lock
+
+class KeyedLockManager:
+    """Async locks for individual requests, users and chats.
+
+    Locks are created on first use and evicted as soon as no task holds or
+    waits for them, so only keys with work in flight take up memory. All the
+    keys of one hold() are taken in KEY_ORDER, which keeps tasks that need
+    overlapping keys from deadlocking. With wait=False, hold() gives up
+    immediately if any key is busy, which is used to turn away duplicate
+    clicks before they reach the database.
+    """
+
+    def __init__(self):
+        self._locks = {}  # {key: _KeyedLock}
+        self.acquired = 0
+        self.contended = 0
+        self.rejected = 0
+        self.peak_locks = 0
+        self.wait_stats = WaitStats()
+
+    @staticmethod
+    def _sorted_keys(keys):
+        return sorted(set(keys), key=lambda key: (KEY_ORDER[key[0]], key[1]))
+
+    def _ref(self, key):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = _KeyedLock()
+            self.peak_locks = max(self.peak_locks, len(self._locks))
+        entry.refs += 1
+        return entry
+
+    def _unref(self, key, entry):
+        entry.refs -= 1
+        if entry.refs == 0 and self._locks.get(key) is entry:
+            del self._locks[key]
+
+    def locked(self, *keys):
+        """Check if any of the keys is held or waited for."""
+        return any(key in self._locks for key in keys)
+
+    @asynccontextmanager
+    async def hold(self, *keys, wait=True):
+        """Hold the locks for all the keys, yielding whether they were acquired.
+
+        With wait=False nothing is held and False is yielded if any key is
+        already busy; otherwise this waits for each key in turn and yields True.
+        """
+        keys = self._sorted_keys(keys)
+        if not wait and self.locked(*keys):
+            self.rejected += 1
+            yield False
+            return
+
+        entries = [(key, self._ref(key)) for key in keys]
+        held = []
+        try:
+            started = time.monotonic()
+            contended = False
+            for key, entry in entries:
+                if entry.lock.locked():
+                    contended = True
+                await entry.lock.acquire()
+                held.append(entry)
+
+            self.acquired += 1
+            if contended:
+                self.contended += 1
+                self.wait_stats.record(time.monotonic() - started)
+            yield True
+        finally:
+            for entry in reversed(held):
+                entry.lock.release()
+            for key, entry in entries:
+                self._unref(key, entry)
+
+    def get_metrics(self):
+        """Return lock counts, contention and time spent waiting for held keys."""
+        return {
+            'locks': len(self._locks),
+            'peak_locks': self.peak_locks,
+            'acquired': self.acquired,
+            'contended': self.contended,
+            'rejected': self.rejected,
+            'wait': self.wait_stats.snapshot()
+        }
@@ -0,0 +1,179 @@
+import logging
+import os
+import re
+import time
+import zlib
+
+import numpy as np
+
+from database.metrics import LatencyHistogram
+
+logger = logging.getLogger('coffee_bot.matcher')
+
+# Size of the hashed feature vectors; a power of two keeps the hash modulo cheap
+MATCH_VECTOR_DIMS = int(os.getenv('MATCH_VECTOR_DIMS', '256'))
+# Lowest similarity at which an open request counts as a match. Scores are cosines of
+# signed hashed vectors, from -1 to 1, with unrelated topics scoring near 0 (rarely
+# above 0.3). Scores of 0 or less never match, whatever this is set to.
+MATCH_MIN_SCORE = float(os.getenv('MATCH_MIN_SCORE', '0.35'))
+# Most of the best matching requests tried before falling back to posting a request
+MATCH_CANDIDATES = int(os.getenv('MATCH_CANDIDATES', '5'))
+
+# Open requests the matrix has room for before it first grows
+INITIAL_CAPACITY = 1024
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9+#]+")
+
+# Words too common in requests to say anything about the topic
+STOP_WORDS = frozenset("""
+a about an and any are as at be but by can chat coffee for from have how i if in
+into is it like looking me my of on or so some talk that the their this to up want
+we what with would you your
+""".split())
+
+def topic_features(text):
+    """Yield the words of a text and the character trigrams of each word."""
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOP_WORDS:
+            continue
+        yield token
+        padded = f" {token} "
+        for start in range(len(padded) - 2):
+            yield padded[start:start + 3]
+
+def vectorize(text, dims=MATCH_VECTOR_DIMS):
+    """Hash a text's features into a unit-length float32 vector.
+
+    Each feature adds +1 or -1 to one dimension, both picked from its CRC32,
+    so unrelated texts score close to zero rather than sharing collisions.
+    """
+    vector = np.zeros(dims, dtype=np.float32)
+    for feature in topic_features(text):
+        digest = zlib.crc32(feature.encode('utf-8'))
+        vector[digest % dims] += 1.0 if digest & 0x80000000 else -1.0
+
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector
+
+class TopicMatcher:
+    """Open requests indexed by topic for automatic matching.
+
+    Every open request is a row of one float32 matrix holding the hashed
+    vectors of its topic and description, next to arrays of request and user
+    IDs. A query is a single matrix-vector product over all rows, so finding
+    the best matches costs no Python work per open request. Removing a
+    request moves the last row into its place, so rows stay contiguous.
+
+    The matcher may briefly hold requests that were closed elsewhere; callers
+    claim a match in the database and remove it if it was no longer open.
+    """
+
+    def __init__(self, dims=MATCH_VECTOR_DIMS, capacity=INITIAL_CAPACITY):
+        self.dims = dims
+        self._vectors = np.zeros((capacity, dims), dtype=np.float32)
+        self._request_ids = np.zeros(capacity, dtype=np.int64)
+        self._user_ids = np.zeros(capacity, dtype=np.int64)
+        self._rows = {}  # {request_id: row}
+        self.queries = 0
+        self.hits = 0
+        self._latency = LatencyHistogram()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, request_id):
+        return request_id in self._rows
+
+    def _grow(self):
+        capacity = len(self._request_ids) * 2
+        for name in ('_vectors', '_request_ids', '_user_ids'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add(self, request_id, user_id, topic, description=None):
+        """Index an open request, replacing it if it is already indexed."""
+        vector = vectorize(f"{topic}\n{description or ''}", self.dims)
+
+        row = self._rows.get(request_id)
+        if row is None:
+            row = len(self._rows)
+            if row == len(self._request_ids):
+                self._grow()
+            self._rows[request_id] = row
+
+        self._vectors[row] = vector
+        self._request_ids[row] = request_id
+        self._user_ids[row] = user_id
+
+    def remove(self, request_id):
+        """Stop matching a request. Returns False if it wasn't indexed."""
+        row = self._rows.pop(request_id, None)
+        if row is None:
+            return False
+
+        last = len(self._rows)
+        if row != last:
+            # Move the last row into the gap
+            self._vectors[row] = self._vectors[last]
+            self._request_ids[row] = self._request_ids[last]
+            self._user_ids[row] = self._user_ids[last]
+            self._rows[int(self._request_ids[row])] = row
+        return True
+
+    def load(self, requests):
+        """Index open requests, replacing everything indexed before."""
+        self._rows.clear()
+        for request in requests:
+            self.add(request['request_id'], request['user_id'], request['topic'], request['description'])
+        logger.info(f"Indexed {len(self._rows)} open requests for matching")
+
+    def best_matches(self, text, exclude_user_id=None, limit=MATCH_CANDIDATES, min_score=MATCH_MIN_SCORE):
+        """Find the open requests most similar to a text, best first.
+
+        Returns up to `limit` (request_id, score) pairs scoring at least
+        `min_score` and above 0, leaving out requests by `exclude_user_id`.
+        Scores range from -1 to 1.
+        """
+        started = time.perf_counter()
+        count = len(self._rows)
+        matches = []
+
+        if count and limit > 0:
+            query = vectorize(text, self.dims)
+            scores = self._vectors[:count] @ query
+            if exclude_user_id is not None:
+                scores[self._user_ids[:count] == exclude_user_id] = -np.inf
+
+            # Pick the best rows without sorting all of them
+            limit = min(limit, count)
+            if limit < count:
+                best = np.argpartition(scores, count - limit)[count - limit:]
+            else:
+                best = np.arange(count)
+            best = best[np.argsort(scores[best])[::-1]]
+
+            matches = [
+                (int(self._request_ids[row]), float(scores[row]))
+                for row in best if scores[row] >= min_score and scores[row] > 0
+            ]
+
+        self.queries += 1
+        if matches:
+            self.hits += 1
+        self._latency.record(time.perf_counter() - started)
+        return matches
+
+    def get_metrics(self):
+        """Return the indexed request count, matrix size, query counts and query latency."""
+        return {
+            'requests': len(self._rows),
+            'capacity': len(self._request_ids),
+            'matrix_bytes': self._vectors.nbytes,
+            'queries': self.queries,
+            'hits': self.hits,
+            'latency': self._latency.snapshot()
+        }
@@ -1,6 +1,8 @@
+import asyncio
 import discord
 import logging
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 import sys
 import os
 
@@ -8,373 +10,494 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.ui import ChatView
-from database import save_message, get_active_chat, end_chat, get_chat_details, get_request_by_chat_id, get_request_by_id
+from utils.participant_cache import ParticipantCache
+from utils.attachments import AttachmentRelay, PreparedAttachments
+from utils.outbound_queue import OutboundQueue, OutboundMessage
+from utils.scheduler import Priority
+from utils.chat_sessions import ChatSession, ChatRegistry
+from utils.request_renderer import RequestMessageRenderer
+from utils.locks import user_key, chat_key
+from database.cache import LRUCache
+from database import log_message, get_active_chat, get_active_chats, end_chat, abort_chat, get_chat_details, get_request_by_chat_id, get_request_by_id
 
 logger = logging.getLogger('coffee_bot.message_handler')
 
+# Most participants resolved at once while hydrating
+HYDRATE_CONCURRENCY = 10
+
+# Users recently found not to be in a chat, so their DMs skip the database
+NOT_IN_CHAT_CACHE_SIZE = int(os.getenv('NOT_IN_CHAT_CACHE_SIZE', '10000'))
+NOT_IN_CHAT_CACHE_TTL = float(os.getenv('NOT_IN_CHAT_CACHE_TTL', '300'))
+
+def parse_started_at(started_at):
+    """Convert a stored UTC started_at timestamp to local time, matching datetime.now()."""
+    if not started_at:
+        return datetime.now()
+    if isinstance(started_at, str):
+        try:
+            started_at = datetime.fromisoformat(started_at)
+        except ValueError:
+            return datetime.now()
+    if started_at.tzinfo is None:
+        started_at = started_at.replace(tzinfo=timezone.utc)
+    return started_at.astimezone().replace(tzinfo=None)
+
 class MessageHandler:
     """Handles message relaying between users in a coffee chat."""
     
     def __init__(self, bot):
         self.bot = bot
-        self.active_chats = {}  # {user_id: {chat_id, partner_id, start_time}}
+        self.sessions = ChatRegistry()
+        self.participants = ParticipantCache(bot)
+        self.request_messages = RequestMessageRenderer(bot, self.participants)
+        self.not_in_chat = LRUCache(NOT_IN_CHAT_CACHE_SIZE, ttl=NOT_IN_CHAT_CACHE_TTL)
+        self._chat_generation = 0  # Bumped whenever users may have joined a chat
+        self.attachments = AttachmentRelay()
+        self.outbound = OutboundQueue(self.deliver_messages, drop=self.drop_message)
+        self._background_tasks = set()
+        self.hydrated = False
+        self.hydration_time = None
+    
+    async def hydrate(self):
+        """Load all active chats from the database and pre-resolve their participants.
+        
+        Runs once at startup so the first message in each chat after a restart
+        needs no database query or user lookup.
+        """
+        if self.hydrated:
+            return
+        
+        start = time.perf_counter()
+        chats = await get_active_chats()
+        
+        user_ids = set()
+        for chat in chats:
+            self.sessions.add(ChatSession(
+                chat['chat_id'],
+                chat['user1_id'],
+                chat['user2_id'],
+                parse_started_at(chat['started_at'])
+            ))
+            user_ids.update((chat['user1_id'], chat['user2_id']))
+        self.invalidate_not_in_chat()
+        
+        # Resolve users and DM channels a few at a time
+        semaphore = asyncio.Semaphore(HYDRATE_CONCURRENCY)
+        
+        async def prewarm(user_id):
+            async with semaphore:
+                await self.participants.resolve(user_id)
+        
+        results = await asyncio.gather(*[prewarm(user_id) for user_id in user_ids], return_exceptions=True)
+        failures = sum(1 for result in results if isinstance(result, Exception))
+        
+        self.hydrated = True
+        self.hydration_time = time.perf_counter() - start
+        logger.info(
+            f"Hydrated {len(chats)} active chats and {len(user_ids) - failures} participants "
+            f"in {self.hydration_time * 1000:.1f} ms"
+        )
+        if failures:
+            logger.warning(f"Could not resolve {failures} chat participants while hydrating")
     
     async def start_chat(self, chat_data):
-        """Start a new chat between two users."""
+        """Start a new chat between two users.
+        
+        Both participants are resolved and both welcome messages are sent
+        concurrently. If either user can't be reached, the chat is aborted for
+        both: its request is cancelled and the other user is told why.
+        """
+        # Chats can't be ended until they have finished starting
+        async with self.bot.locks.hold(chat_key(chat_data['chat_id'])):
+            return await self._start_chat(chat_data)
+    
+    async def _start_chat(self, chat_data):
         chat_id = chat_data['chat_id']
         user1_id = chat_data['user1_id']
         user2_id = chat_data['user2_id']
         topic = chat_data['topic']
         
-        # Setup chat data for both users
-        now = datetime.now()
-        self.active_chats[user1_id] = {
-            'chat_id': chat_id,
-            'partner_id': user2_id,
-            'start_time': now
-        }
-        self.active_chats[user2_id] = {
-            'chat_id': chat_id,
-            'partner_id': user1_id,
-            'start_time': now
-        }
+        # Register the chat for both users
+        session = ChatSession(chat_id, user1_id, user2_id, datetime.now())
+        self.sessions.add(session)
+        self.invalidate_not_in_chat(user1_id, user2_id)
         
-        # Send initial messages to both users
-        user1 = await self.bot.fetch_user(user1_id)
-        user2 = await self.bot.fetch_user(user2_id)
+        # Resolve both participants once for the whole chat
+        participants = await asyncio.gather(
+            self.participants.resolve(user1_id),
+            self.participants.resolve(user2_id),
+            return_exceptions=True
+        )
+        for user_id, participant in zip((user1_id, user2_id), participants):
+            if isinstance(participant, Exception):
+                logger.error(f"Cannot resolve user {user_id} for chat {chat_id}: {participant}")
+                await self.abort_unreachable_chat(session, user_id)
+                return False
+        participant1, participant2 = participants
         
         # Create chat view for ending the chat
         view = ChatView(self.handle_end_chat)
         
-        # Send welcome message to user1
-        embed1 = discord.Embed(
-            title=f"☕ Coffee Chat Started: {topic}",
-            description=f"You are now chatting with **{user2.display_name}**. All messages you send here will be relayed to them.",
-            color=discord.Color.green()
-        )
-        embed1.add_field(name="How to use", value="Simply type messages in this DM to chat. Click 'End Chat' when you're finished.")
-        embed1.set_footer(text=f"Chat ID: {chat_id}")
+        # Send both welcome messages at once
+        welcomes = []
+        for participant, partner in ((participant1, participant2.user), (participant2, participant1.user)):
+            embed = discord.Embed(
+                title=f"☕ Coffee Chat Started: {topic}",
+                description=f"You are now chatting with **{partner.display_name}**. All messages you send here will be relayed to them.",
+                color=discord.Color.green()
+            )
+            embed.add_field(name="How to use", value="Simply type messages in this DM to chat. Click 'End Chat' when you're finished.")
+            embed.set_footer(text=f"Chat ID: {chat_id}")
+            welcomes.append(self.bot.scheduler.send(participant.channel, embed=embed, view=view))
+        
+        results = await asyncio.gather(*welcomes, return_exceptions=True)
+        for user_id, result in zip((user1_id, user2_id), results):
+            if isinstance(result, Exception):
+                logger.error(f"Cannot send DM to user {user_id}: {result}")
+                await self.abort_unreachable_chat(session, user_id)
+                return False
         
-        try:
-            await user1.send(embed=embed1, view=view)
-        except discord.Forbidden:
-            logger.error(f"Cannot send DM to user {user1_id}")
-            await self.cleanup_chat(user1_id)
-            return False
+        logger.info(f"Started chat {chat_id} between users {user1_id} and {user2_id}")
+        return True
+    
+    async def abort_unreachable_chat(self, session, unreachable_id):
+        """Undo a chat that could not be started because a user can't be reached.
         
-        # Send welcome message to user2
-        embed2 = discord.Embed(
-            title=f"☕ Coffee Chat Started: {topic}",
-            description=f"You are now chatting with **{user1.display_name}**. All messages you send here will be relayed to them.",
-            color=discord.Color.green()
-        )
-        embed2.add_field(name="How to use", value="Simply type messages in this DM to chat. Click 'End Chat' when you're finished.")
-        embed2.set_footer(text=f"Chat ID: {chat_id}")
+        The request is cancelled if the requester can't be reached, and put
+        back up for others to accept if the accepter can't.
+        """
+        if not self.sessions.remove(session):
+            return
         
-        try:
-            await user2.send(embed=embed2, view=view)
-        except discord.Forbidden:
-            logger.error(f"Cannot send DM to user {user2_id}")
-            await self.cleanup_chat(user2_id)
-            return False
+        partner_id = session.partner_of(unreachable_id)
+        request = await abort_chat(session.chat_id, unreachable_id)
+        requeued = request is not None and request['status'] == 'pending'
         
-        logger.info(f"Started chat {chat_id} between users {user1_id} and {user2_id}")
-        return True
+        if requeued:
+            # Let Find a Match offer the request again
+            commands_cog = self.bot.get_cog('CoffeeCommands')
+            if commands_cog is not None:
+                commands_cog.matcher.add(
+                    request['request_id'], request['requester_id'], request['topic'], request['description']
+                )
+        
+        # Let the reachable user know the chat isn't happening
+        partner = self.participants.peek(partner_id)
+        if partner:
+            description = "Your coffee chat couldn't be started because your partner can't receive direct messages from the bot."
+            if requeued:
+                description += " Your request is open again for others to accept."
+            embed = discord.Embed(
+                title="☕ Coffee Chat Cancelled",
+                description=description,
+                color=discord.Color.red()
+            )
+            embed.set_footer(text=f"Chat ID: {session.chat_id}")
+            try:
+                await self.bot.scheduler.send(await self.participants.get_channel(partner_id), embed=embed)
+            except discord.HTTPException as e:
+                logger.error(f"Cannot send DM to user {partner_id}: {e}")
+        
+        # Render the request message while both participants' names are still cached
+        if request:
+            embed = self.request_messages.render(request)
+            self.run_in_background(self.request_messages.update(request, embed))
+        
+        self.participants.discard(session.user1_id)
+        self.participants.discard(session.user2_id)
+        await self.update_bot_status()
+        
+        logger.info(f"Aborted chat {session.chat_id} because user {unreachable_id} can't be reached")
     
     async def relay_message(self, message):
-        """Relay a message from one user to another in an active chat."""
+        """Queue a message from one user for delivery to their chat partner.
+        
+        Messages are queued before anything is awaited so they are delivered
+        in the order they were received.
+        """
         author_id = message.author.id
         
         # Check if user is in an active chat
-        if author_id not in self.active_chats:
+        session = self.sessions.get(author_id)
+        if not session:
             return False
         
-        chat_data = self.active_chats[author_id]
-        chat_id = chat_data['chat_id']
-        partner_id = chat_data['partner_id']
+        # Start fetching attachments right away; they are awaited when delivered
+        attachments = None
+        if message.attachments:
+            attachments = asyncio.create_task(self.attachments.prepare(message.attachments))
         
-        # Get partner user
+        self.outbound.enqueue(session.partner_of(author_id), OutboundMessage(
+            chat_id=session.chat_id,
+            sender_id=author_id,
+            author=message.author,
+            content=message.content,
+            created_at=message.created_at,
+            attachments=attachments
+        ))
+        return True
+    
+    async def deliver_messages(self, partner_id, batch):
+        """Send a batch of queued messages from one sender as a single embed."""
+        first = batch[0]
+        author = first.author
+        
+        # Get partner's DM channel (resolved when the chat started)
         try:
-            partner = await self.bot.fetch_user(partner_id)
+            partner_channel = await self.participants.get_channel(partner_id)
         except discord.NotFound:
             logger.error(f"Partner user {partner_id} not found")
-            await self.end_user_chat(author_id)
+            for message in batch:
+                self.drop_message(message)
+            self.outbound.discard(partner_id)
+            await self.end_user_chat(first.sender_id)
             return False
         
-        # Create embed for the message
+        # Create embed for the messages; only text-only messages are batched
+        content = "\n".join(message.content for message in batch if message.content)
         embed = discord.Embed(
-            description=message.content if message.content else "*No text content*",
+            description=content if content else "*No text content*",
             color=discord.Color.blue()
         )
         # Include both display name and username in the author field
-        embed.set_author(name=f"{message.author.display_name} ({message.author.name})", icon_url=message.author.display_avatar.url)
-        embed.timestamp = message.created_at
+        embed.set_author(name=f"{author.display_name} ({author.name})", icon_url=author.display_avatar.url)
+        embed.timestamp = first.created_at
         
-        # Handle attachments
-        files = []
-        has_attachment = False
+        # Attachments over the budget are sent as links
+        attachments = PreparedAttachments()
+        if first.attachments:
+            attachments = await first.attachments
         
-        for attachment in message.attachments:
-            try:
-                file = await attachment.to_file()
-                files.append(file)
-                has_attachment = True
-            except discord.HTTPException:
-                logger.error(f"Failed to download attachment from {message.author.id}")
+        if attachments.links:
+            links = "\n".join(f"[{filename}]({url})" for filename, url in attachments.links)
+            embed.add_field(name="Attachments", value=links[:1024], inline=False)
         
         # Send message to partner
         try:
-            await partner.send(embed=embed, files=files)
+            await self.bot.scheduler.send(partner_channel, Priority.RELAY, embed=embed, files=attachments.files)
         except discord.Forbidden:
             logger.error(f"Cannot send message to user {partner_id}")
-            await self.end_user_chat(author_id)
+            self.outbound.discard(partner_id)
+            await self.end_user_chat(first.sender_id)
             return False
-        
-        # Save message to database
-        await save_message(
-            chat_id=chat_id,
-            sender_id=author_id,
-            content=message.content,
-            has_attachment=has_attachment
-        )
+        finally:
+            self.attachments.release(attachments)
+        
+        # Queue the messages to be saved with the next batched write
+        for message in batch:
+            log_message(
+                chat_id=message.chat_id,
+                sender_id=message.sender_id,
+                content=message.content,
+                has_attachment=message.attachments is not None
+            )
         
         return True
     
+    def drop_message(self, message):
+        """Release the attachments of a queued message that won't be delivered."""
+        if message.attachments is None:
+            return
+        
+        if message.attachments.done():
+            if not message.attachments.cancelled() and message.attachments.exception() is None:
+                self.attachments.release(message.attachments.result())
+        else:
+            message.attachments.cancel()
+    
     async def handle_end_chat(self, interaction):
         """Handle a user clicking the End Chat button."""
         user_id = interaction.user.id
         
-        if user_id not in self.active_chats:
-            await interaction.response.send_message("You don't have an active chat.", ephemeral=True)
-            return
-        
-        await interaction.response.defer()
-        await self.end_user_chat(user_id)
+        # Turn away repeated clicks while the chat is being ended
+        async with self.bot.locks.hold(user_key(user_id), wait=False) as acquired:
+            if not acquired:
+                await interaction.response.send_message("Your chat is already being ended.", ephemeral=True)
+                return
+            
+            if user_id not in self.sessions:
+                await interaction.response.send_message("You don't have an active chat.", ephemeral=True)
+                return
+            
+            await interaction.response.defer()
+            await self.end_user_chat(user_id)
     
     async def end_user_chat(self, user_id, silent=False):
-        """End a chat for a user and notify their partner."""
-        chat_data = self.active_chats.pop(user_id, None)
-        if not chat_data:
+        """End a chat for a user and notify their partner.
+        
+        The chat is ended in the database while both participants are looked
+        up, and both users are notified at once. A user who can't be notified
+        doesn't stop the other from being told. The request message and bot
+        status are updated in the background.
+        """
+        session = self.sessions.get(user_id)
+        if not session:
             return False
         
-        partner_id = chat_data['partner_id']
-        chat_id = chat_data['chat_id']
+        # Wait for the chat to finish starting, and end it only once
+        async with self.bot.locks.hold(chat_key(session.chat_id)):
+            if not self.sessions.remove(session):
+                return False
+            return await self._end_session(session, user_id, silent)
+    
+    async def _end_session(self, session, user_id, silent):
+        partner_id = session.partner_of(user_id)
+        chat_id = session.chat_id
         
         # Calculate duration in minutes
-        duration = int((datetime.now() - chat_data['start_time']).total_seconds() / 60)
-        
-        # End chat in database
-        await end_chat(chat_id, duration)
+        duration = int((datetime.now() - session.start_time).total_seconds() / 60)
+        
+        # End chat in database, getting back the completed request
+        if silent:
+            request = await end_chat(chat_id, duration)
+        else:
+            request, user, partner = await asyncio.gather(
+                end_chat(chat_id, duration),
+                self.participants.resolve(user_id),
+                self.participants.resolve(partner_id),
+                return_exceptions=True
+            )
+            if isinstance(request, Exception):
+                raise request
         
-        # Update the original request message with completion details
-        await self.update_request_message(chat_id)
+        # Neither user is in a chat now, so their next DMs need no lookup
+        self.not_in_chat.put(user_id, True)
+        self.not_in_chat.put(partner_id, True)
         
         if not silent:
             # Notify both users about the chat ending
-            user = await self.bot.fetch_user(user_id)
-            partner = await self.bot.fetch_user(partner_id)
-            
-            # Create stylized end chat embeds
-            user_name = f"{user.display_name} ({user.name})"
-            partner_name = f"{partner.display_name} ({partner.name})"
-            
-            user_embed = discord.Embed(
-                title="☕ Coffee Chat Ended",
-                description=f"Your coffee chat with **{partner_name}** has ended.",
-                color=discord.Color.purple()
-            )
-            user_embed.add_field(name="Duration", value=f"{duration} minutes", inline=True)
-            user_embed.add_field(name="Ended at", value=f"<t:{int(datetime.now().timestamp())}:f>", inline=True)
-            user_embed.set_footer(text=f"Chat ID: {chat_id}")
-            
-            partner_embed = discord.Embed(
-                title="☕ Coffee Chat Ended",
-                description=f"Your coffee chat with **{user_name}** has ended.",
-                color=discord.Color.purple()
-            )
-            partner_embed.add_field(name="Duration", value=f"{duration} minutes", inline=True)
-            partner_embed.add_field(name="Ended at", value=f"<t:{int(datetime.now().timestamp())}:f>", inline=True)
-            partner_embed.set_footer(text=f"Chat ID: {chat_id}")
+            notifications = []
+            ended_at = int(datetime.now().timestamp())
+            for participant, other, other_id in ((user, partner, partner_id), (partner, user, user_id)):
+                if isinstance(participant, Exception):
+                    logger.error(f"Cannot notify a user in chat {chat_id} that it ended: {participant}")
+                    continue
+                
+                # Create stylized end chat embed
+                other_name = "your partner" if isinstance(other, Exception) else f"{other.user.display_name} ({other.user.name})"
+                embed = discord.Embed(
+                    title="☕ Coffee Chat Ended",
+                    description=f"Your coffee chat with **{other_name}** has ended.",
+                    color=discord.Color.purple()
+                )
+                embed.add_field(name="Duration", value=f"{duration} minutes", inline=True)
+                embed.add_field(name="Ended at", value=f"<t:{ended_at}:f>", inline=True)
+                embed.set_footer(text=f"Chat ID: {chat_id}")
+                notifications.append(self.bot.scheduler.send(participant.channel, embed=embed))
             
-            # Notify users with stylized embeds
-            await user.send(embed=user_embed)
-            await partner.send(embed=partner_embed)
-        
-        # Clean up active chats
-        await self.cleanup_chat(partner_id)
-        
-        # Update bot status after ending a chat
+            results = await asyncio.gather(*notifications, return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Cannot notify a user in chat {chat_id} that it ended: {result}")
+        
+        # Update the original request message off the critical path, rendering it
+        # while both participants' names are still cached
+        if request:
+            embed = self.request_messages.render(request)
+            self.run_in_background(self.request_messages.update(request, embed))
+        
+        # Forget the participants now that the chat is over
+        self.participants.discard(user_id)
+        self.participants.discard(partner_id)
         await self.update_bot_status()
         
         logger.info(f"Ended chat {chat_id} between users {user_id} and {partner_id}")
         return True
-        
+    
+    def run_in_background(self, coro):
+        """Run cosmetic work such as message edits without waiting for it."""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_task_done)
+        return task
+    
+    def _background_task_done(self, task):
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Error in background task: {task.exception()}")
+    
     async def update_bot_status(self):
-        """Update the bot's status to reflect available coffee chats."""
+        """Let the status updater know the available coffee chats may have changed."""
         if hasattr(self.bot, 'status_updater') and self.bot.status_updater:
-            await self.bot.status_updater.update_status()
+            self.bot.status_updater.notify()
     
-    async def update_request_message(self, chat_id=None, request_id=None):
-        """Update a request message with the latest status."""
-        if not chat_id and not request_id:
+    async def update_request_message(self, chat_id=None, request_id=None, request=None):
+        """Update a request message with the latest status.
+        
+        Pass `request` when it is already known (as returned by end_chat) to
+        skip looking it up by chat_id or request_id.
+        """
+        if not chat_id and not request_id and not request:
             return False
         
         try:
-            if chat_id:
+            if not request and chat_id:
                 # Get request by chat_id
                 request = await get_request_by_chat_id(chat_id)
-            else:
+            elif not request:
                 # Get request by request_id
                 request = await get_request_by_id(request_id)
             
             if not request:
                 return False
             
-            # Get message details
-            guild_id = request['guild_id']
-            channel_id = request['channel_id']
-            message_id = request['message_id']
-            
-            # Get guild and channel
-            guild = self.bot.get_guild(guild_id)
-            if not guild:
-                return False
-            
-            channel = guild.get_channel(channel_id)
-            if not channel:
-                return False
-            
-            # Try to get the message
-            try:
-                message = await channel.fetch_message(message_id)
-            except (discord.NotFound, discord.Forbidden, discord.HTTPException):
-                return False
-            
-            # Get user information
-            requester = await self.bot.fetch_user(request['requester_id'])
-            requester_name = f"{requester.display_name} ({requester.name})"
-            
-            responder_name = "None"
-            if request['responder_id']:
-                responder = await self.bot.fetch_user(request['responder_id'])
-                responder_name = f"{responder.display_name} ({responder.name})"
-            
-            # Helper function to convert timestamp string to unix timestamp
-            def get_timestamp(ts):
-                if not ts:
-                    return int(datetime.now().timestamp())
-                if isinstance(ts, str):
-                    try:
-                        # Try parsing ISO format
-                        dt = datetime.fromisoformat(ts.replace('Z', '+00:00'))
-                        return int(dt.timestamp())
-                    except ValueError:
-                        # Default to current time if parsing fails
-                        return int(datetime.now().timestamp())
-                return int(ts)
-            
-            # Create embed based on request status
-            if request['status'] == 'pending':
-                embed = discord.Embed(
-                    title=f"☕ Coffee Chat Request: {request['topic']}",
-                    description=request['description'],
-                    color=discord.Color.blue()
-                )
-                embed.add_field(name="Requested by", value=requester_name, inline=True)
-                embed.add_field(name="Status", value="Pending", inline=True)
-                embed.add_field(name="Created at", value=f"<t:{get_timestamp(request['created_at'])}:f>", inline=True)
-                
-                # Create view with accept button
-                view = discord.ui.View()
-                accept_button = discord.ui.Button(
-                    label="Accept Request", 
-                    style=discord.ButtonStyle.green,
-                    custom_id=f"accept_request:{request['request_id']}"
-                )
-                view.add_item(accept_button)
-                
-                await message.edit(embed=embed, view=view)
-                
-            elif request['status'] == 'accepted':
-                embed = discord.Embed(
-                    title=f"☕ Coffee Chat Request: {request['topic']}",
-                    description=request['description'],
-                    color=discord.Color.green()
-                )
-                embed.add_field(name="Requested by", value=requester_name, inline=True)
-                embed.add_field(name="Accepted by", value=responder_name, inline=True)
-                embed.add_field(name="Status", value="In Progress", inline=True)
-                embed.add_field(name="Created at", value=f"<t:{get_timestamp(request['created_at'])}:f>", inline=True)
-                embed.add_field(name="Accepted at", value=f"<t:{get_timestamp(request['accepted_at'])}:f>", inline=True)
-                
-                await message.edit(embed=embed, view=None)
-                
-            elif request['status'] == 'completed':
-                # Calculate duration in minutes
-                duration = request['duration'] or 0
-                
-                embed = discord.Embed(
-                    title=f"☕ Coffee Chat Request: {request['topic']}",
-                    description=request['description'],
-                    color=discord.Color.purple()
-                )
-                embed.add_field(name="Requested by", value=requester_name, inline=True)
-                embed.add_field(name="Accepted by", value=responder_name, inline=True)
-                embed.add_field(name="Duration", value=f"{duration} minutes", inline=True)
-                embed.add_field(name="Status", value="Completed", inline=True)
-                embed.add_field(name="Created at", value=f"<t:{get_timestamp(request['created_at'])}:f>", inline=True)
-                embed.add_field(name="Completed at", value=f"<t:{get_timestamp(request['completed_at'])}:f>", inline=True)
-                
-                await message.edit(embed=embed, view=None)
-                
-            elif request['status'] == 'cancelled':
-                embed = discord.Embed(
-                    title=f"☕ Coffee Chat Request: {request['topic']}",
-                    description=request['description'],
-                    color=discord.Color.red()
-                )
-                embed.add_field(name="Requested by", value=requester_name, inline=True)
-                embed.add_field(name="Status", value="Cancelled", inline=True)
-                embed.add_field(name="Created at", value=f"<t:{get_timestamp(request['created_at'])}:f>", inline=True)
-                embed.add_field(name="Cancelled at", value=f"<t:{get_timestamp(request['cancelled_at'])}:f>", inline=True)
-                
-                await message.edit(embed=embed, view=None)
-            
-            return True
+            return await self.request_messages.update(request)
         except Exception as e:
             logger.error(f"Error updating request message: {e}")
             return False
     
-    async def cleanup_chat(self, user_id):
-        """Clean up chat data for a user and their partner."""
-        if user_id not in self.active_chats:
-            return
-        
-        partner_id = self.active_chats[user_id]['partner_id']
-        
-        # Remove both users from active chats
-        if user_id in self.active_chats:
-            del self.active_chats[user_id]
-        
-        if partner_id in self.active_chats:
-            del self.active_chats[partner_id]
+    async def close(self):
+        """Release resources held by the message handler."""
+        if self._background_tasks:
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        await self.request_messages.close()
+        await self.outbound.close()
+        await self.attachments.close()
     
     async def is_in_active_chat(self, user_id):
         """Check if a user is in an active chat."""
         # First check our local cache
-        if user_id in self.active_chats:
+        if user_id in self.sessions:
             return True
         
+        # Users recently found not to be in a chat can't be in one until start_chat runs
+        if self.not_in_chat.get(user_id):
+            return False
+        
         # Then check the database as a fallback
+        generation = self._chat_generation
         chat = await get_active_chat(user_id)
         if chat:
             # Restore the chat data in our cache
-            partner_id = chat['user1_id'] if user_id == chat['user2_id'] else chat['user2_id']
-            self.active_chats[user_id] = {
-                'chat_id': chat['chat_id'],
-                'partner_id': partner_id,
-                'start_time': datetime.now()  # Approximation since we don't know the exact start time
-            }
+            self.sessions.add(ChatSession(
+                chat['chat_id'],
+                chat['user1_id'],
+                chat['user2_id'],
+                parse_started_at(chat['started_at'])
+            ))
             return True
         
+        # Don't cache the result if a chat may have started during the query
+        if generation == self._chat_generation:
+            self.not_in_chat.put(user_id, True)
         return False
+    
+    def invalidate_not_in_chat(self, *user_ids):
+        """Forget that users are not in a chat; with no user IDs, forget all of them."""
+        self._chat_generation += 1
+        if user_ids:
+            for user_id in user_ids:
+                self.not_in_chat.pop(user_id)
+        else:
+            self.not_in_chat.clear()
+    
+    def get_metrics(self):
+        """Return metrics for the chat registry and the caches and queues used for relaying."""
+        return {
+            'sessions': self.sessions.memory_usage(),
+            'not_in_chat': self.not_in_chat.get_metrics(),
+            'participants': self.participants.get_metrics(),
+            'request_messages': self.request_messages.get_metrics(),
+            'outbound': self.outbound.get_metrics(),
+            'attachments': self.attachments.get_metrics()
+        }
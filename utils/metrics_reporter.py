@@ -0,0 +1,114 @@
+import asyncio
+import json
+import logging
+import os
+
+from database import get_menu_metrics, get_pool_metrics
+from database.message_log import message_log
+
+logger = logging.getLogger('coffee_bot.metrics')
+
+# Seconds between metrics log lines; 0 turns them off
+METRICS_LOG_INTERVAL = float(os.getenv('METRICS_LOG_INTERVAL', '300'))
+
+class MetricsReporter:
+    """Periodically logs the metrics collected across the bot.
+
+    Each interval an INFO line summarizes the numbers worth watching (menu
+    latency, database waits, outbound queues and contention), and the full
+    metrics of every component are logged at DEBUG as JSON.
+    """
+
+    def __init__(self, bot, interval=METRICS_LOG_INTERVAL):
+        self.bot = bot
+        self.interval = interval
+        self.task = None
+
+    def collect(self):
+        """Gather the metrics of every component that is running."""
+        metrics = {
+            'menu': get_menu_metrics(),
+            'pool': get_pool_metrics(),
+            'message_log': message_log.get_metrics()
+        }
+
+        for name in ('scheduler', 'locks', 'status_updater', 'message_handler'):
+            component = getattr(self.bot, name, None)
+            if component is not None:
+                metrics[name] = component.get_metrics()
+
+        commands_cog = self.bot.get_cog('CoffeeCommands')
+        if commands_cog is not None:
+            metrics['matcher'] = commands_cog.matcher.get_metrics()
+        return metrics
+
+    def summarize(self, metrics):
+        """Build the one-line summary of the most important metrics."""
+        parts = [
+            f"menu p50={metrics['menu']['p50_ms']}ms p99={metrics['menu']['p99_ms']}ms n={metrics['menu']['count']}"
+        ]
+
+        pool = metrics['pool']
+        if pool:
+            parts.append(
+                f"db reader_wait max={pool['reader_wait']['max_ms']}ms "
+                f"writer_wait max={pool['writer_wait']['max_ms']}ms"
+            )
+
+        scheduler = metrics.get('scheduler')
+        if scheduler:
+            parts.append(
+                f"outbound queued={sum(scheduler['queued'].values())} "
+                f"failed={scheduler['failed']} shed={scheduler['shed']}"
+            )
+
+        message_handler = metrics.get('message_handler')
+        if message_handler:
+            outbound = message_handler['outbound']
+            parts.append(
+                f"chats={message_handler['sessions']['sessions']} "
+                f"relay queued={outbound['queued']} delay max={outbound['added_delay']['max_ms']}ms"
+            )
+
+        locks = metrics.get('locks')
+        if locks:
+            parts.append(f"locks contended={locks['contended']} rejected={locks['rejected']}")
+
+        matcher = metrics.get('matcher')
+        if matcher:
+            parts.append(f"matcher requests={matcher['requests']} p99={matcher['latency']['p99_ms']}ms")
+
+        return " | ".join(parts)
+
+    def log_metrics(self):
+        """Log the summary line and the full metrics."""
+        metrics = self.collect()
+        logger.info(f"Metrics: {self.summarize(metrics)}")
+        logger.debug(f"Full metrics: {json.dumps(metrics, default=str)}")
+
+    def start(self):
+        """Start logging metrics periodically, unless turned off."""
+        if self.task is None and self.interval > 0:
+            self.task = asyncio.create_task(self._report_loop())
+
+    async def _report_loop(self):
+        """Background task that logs metrics on an interval."""
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                try:
+                    self.log_metrics()
+                except Exception as e:
+                    logger.error(f"Error logging metrics: {e}")
+        except asyncio.CancelledError:
+            pass
+
+    def stop(self):
+        """Stop logging metrics, logging them one last time."""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+            try:
+                self.log_metrics()
+            except Exception as e:
+                logger.error(f"Error logging metrics: {e}")
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+from database.metrics import WaitStats
+
+logger = logging.getLogger('coffee_bot.outbound_queue')
+
+# Most seconds apart two text-only messages from one sender can be sent and still be merged
+OUTBOUND_COALESCE_WINDOW = float(os.getenv('OUTBOUND_COALESCE_WINDOW', '0.5'))
+
+# Most characters Discord allows in an embed description
+EMBED_DESCRIPTION_LIMIT = 4096
+
+class OutboundMessage:
+    """A relayed message waiting to be delivered to a chat partner."""
+
+    __slots__ = ('chat_id', 'sender_id', 'author', 'content', 'created_at',
+                 'attachments', 'enqueued_at')
+
+    def __init__(self, chat_id, sender_id, author, content, created_at, attachments=None):
+        self.chat_id = chat_id
+        self.sender_id = sender_id
+        self.author = author
+        self.content = content
+        self.created_at = created_at
+        self.attachments = attachments  # Task preparing the attachments, or None
+        self.enqueued_at = time.monotonic()
+
+    @property
+    def text_only(self):
+        return self.attachments is None and bool(self.content)
+
+class OutboundQueue:
+    """Ordered per-recipient queues for relayed messages.
+
+    Each recipient gets a worker that delivers their messages one batch at a
+    time, so messages arrive in the order they were sent. A message reaching
+    an idle queue is delivered right away; consecutive text-only messages
+    from the same sender that queue up behind a delivery in progress, sent
+    within the coalesce window of each other, are delivered together as one
+    embed, up to the description limit.
+    """
+
+    def __init__(self, deliver, drop=None, coalesce_window=OUTBOUND_COALESCE_WINDOW,
+                 max_length=EMBED_DESCRIPTION_LIMIT):
+        self.deliver = deliver  # async deliver(recipient_id, [OutboundMessage])
+        self.drop = drop  # drop(OutboundMessage) for messages that won't be delivered
+        self.coalesce_window = coalesce_window
+        self.max_length = max_length
+        self.messages = 0
+        self.batches = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.peak_depth = 0
+        self.delay = WaitStats()
+        self._queues = {}  # {recipient_id: deque of OutboundMessage}
+        self._workers = {}  # {recipient_id: worker task}
+
+    def enqueue(self, recipient_id, message):
+        """Queue a message for a recipient, starting their worker if needed."""
+        queue = self._queues.get(recipient_id)
+        if queue is None:
+            queue = self._queues[recipient_id] = deque()
+            self._workers[recipient_id] = asyncio.create_task(self._worker(recipient_id, queue))
+
+        queue.append(message)
+        self.messages += 1
+        self.peak_depth = max(self.peak_depth, len(queue))
+
+    def discard(self, recipient_id):
+        """Drop the messages still queued for a recipient."""
+        queue = self._queues.get(recipient_id)
+        while queue:
+            self._drop(queue.popleft())
+
+    def _drop(self, message):
+        self.dropped += 1
+        if self.drop:
+            self.drop(message)
+
+    def _can_coalesce(self, previous, message, length):
+        return (
+            message.text_only
+            and message.sender_id == previous.sender_id
+            and message.chat_id == previous.chat_id
+            and message.enqueued_at - previous.enqueued_at <= self.coalesce_window
+            and length + 1 + len(message.content) <= self.max_length
+        )
+
+    def _take_batch(self, queue):
+        """Pop the next message plus any queued messages that merge into it."""
+        first = queue.popleft()
+        batch = [first]
+        if not first.text_only:
+            return batch
+
+        length = len(first.content)
+        while queue and self._can_coalesce(batch[-1], queue[0], length):
+            message = queue.popleft()
+            length += 1 + len(message.content)
+            batch.append(message)
+        return batch
+
+    async def _worker(self, recipient_id, queue):
+        """Deliver a recipient's messages until their queue is empty."""
+        try:
+            while queue:
+                # Nothing waits for a burst; messages queued during the last delivery merge here
+                batch = self._take_batch(queue)
+                self.batches += 1
+                self.coalesced += len(batch) - 1
+                self.delay.record(time.monotonic() - batch[0].enqueued_at)
+
+                try:
+                    await self.deliver(recipient_id, batch)
+                except Exception as e:
+                    logger.error(f"Error delivering messages to user {recipient_id}: {e}")
+        finally:
+            if self._queues.get(recipient_id) is queue:
+                del self._queues[recipient_id]
+                del self._workers[recipient_id]
+
+    async def close(self):
+        """Stop all workers, dropping undelivered messages."""
+        workers = list(self._workers.values())
+        for recipient_id in list(self._queues):
+            self.discard(recipient_id)
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    def get_metrics(self):
+        """Return queue depth, batching counters and the delay added by queueing."""
+        return {
+            'queued': sum(len(queue) for queue in self._queues.values()),
+            'recipients': len(self._queues),
+            'peak_depth': self.peak_depth,
+            'messages': self.messages,
+            'batches': self.batches,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'added_delay': self.delay.snapshot()
+        }
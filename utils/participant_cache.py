@@ -0,0 +1,81 @@
+import os
+import time
+
+# Seconds before a resolved participant is looked up again
+PARTICIPANT_CACHE_TTL = float(os.getenv('PARTICIPANT_CACHE_TTL', '3600'))
+
+class Participant:
+    """A chat participant's user object and DM channel."""
+
+    __slots__ = ('user', 'channel', 'expires_at')
+
+    def __init__(self, user, channel, expires_at):
+        self.user = user
+        self.channel = channel
+        self.expires_at = expires_at
+
+class ParticipantCache:
+    """Users and DM channels of chat participants, resolved once per chat.
+
+    Lookups try the gateway cache with bot.get_user before falling back to a
+    REST fetch_user call, and entries are refreshed once they expire. While an
+    entry is fresh, relaying a message needs no lookup at all.
+    """
+
+    def __init__(self, bot, ttl=PARTICIPANT_CACHE_TTL):
+        self.bot = bot
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.rest_fetches = 0
+        self._entries = {}  # {user_id: Participant}
+
+    def peek(self, user_id):
+        """Get a cached user without resolving it, or None."""
+        entry = self._entries.get(user_id)
+        if entry and entry.expires_at > time.monotonic():
+            return entry.user
+        return None
+
+    async def resolve(self, user_id):
+        """Get a participant, resolving the user and DM channel if needed.
+
+        Raises discord.NotFound if the user no longer exists.
+        """
+        entry = self._entries.get(user_id)
+        if entry and entry.expires_at > time.monotonic():
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        user = self.bot.get_user(user_id)
+        if user is None:
+            user = await self.bot.fetch_user(user_id)
+            self.rest_fetches += 1
+
+        channel = user.dm_channel or await user.create_dm()
+
+        entry = Participant(user, channel, time.monotonic() + self.ttl)
+        self._entries[user_id] = entry
+        return entry
+
+    async def get_user(self, user_id):
+        """Get a participant's user object."""
+        return (await self.resolve(user_id)).user
+
+    async def get_channel(self, user_id):
+        """Get a participant's DM channel."""
+        return (await self.resolve(user_id)).channel
+
+    def discard(self, user_id):
+        """Forget a participant once they are no longer in a chat."""
+        self._entries.pop(user_id, None)
+
+    def get_metrics(self):
+        """Return cache size and lookup counters."""
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'rest_fetches': self.rest_fetches
+        }
@@ -0,0 +1,192 @@
+import discord
+import logging
+import os
+from datetime import datetime
+
+from database import get_cached_username
+from database.cache import LRUCache
+from utils.edit_debouncer import EditDebouncer
+from utils.ui import create_accept_view
+
+logger = logging.getLogger('coffee_bot.request_renderer')
+
+# Number of deleted request messages remembered so they aren't edited again
+DEAD_MESSAGE_CACHE_SIZE = int(os.getenv('DEAD_MESSAGE_CACHE_SIZE', '10000'))
+
+def get_timestamp(ts):
+    """Convert a stored timestamp to a unix timestamp for Discord formatting."""
+    if not ts:
+        return int(datetime.now().timestamp())
+    if isinstance(ts, str):
+        try:
+            # Try parsing ISO format
+            dt = datetime.fromisoformat(ts.replace('Z', '+00:00'))
+            return int(dt.timestamp())
+        except ValueError:
+            # Default to current time if parsing fails
+            return int(datetime.now().timestamp())
+    return int(ts)
+
+class RequestMessageRenderer:
+    """Renders and edits the channel messages that show a chat request's status.
+
+    Messages are edited through partial messages built from the stored
+    channel and message IDs, so no message is fetched first. Names come from
+    the participant and identity caches, falling back to a mention that
+    Discord renders itself. Edits go through a debouncer so only the latest
+    state of a message is applied, and messages found to be deleted are
+    remembered and skipped on later updates.
+    """
+
+    def __init__(self, bot, participants, dead_cache_size=DEAD_MESSAGE_CACHE_SIZE):
+        self.bot = bot
+        self.participants = participants
+        self.dead_messages = LRUCache(dead_cache_size)
+        self.debouncer = EditDebouncer(self._apply_edit)
+        self.edits = 0
+        self.skipped = 0
+
+    def display_name(self, user_id):
+        """Get a user's name without any API or database call."""
+        user = self.participants.peek(user_id)
+        if user:
+            return f"{user.display_name} ({user.name})"
+
+        username = get_cached_username(user_id)
+        if username:
+            return username
+        return f"<@{user_id}>"
+
+    def render(self, request):
+        """Build the embed for a request in its current status."""
+        requester_name = self.display_name(request['requester_id'])
+
+        responder_name = "None"
+        if request['responder_id']:
+            responder_name = self.display_name(request['responder_id'])
+
+        status = request['status']
+        if status == 'pending':
+            embed = discord.Embed(
+                title=f"☕ Coffee Chat Request: {request['topic']}",
+                description=request['description'],
+                color=discord.Color.blue()
+            )
+            embed.add_field(name="Requested by", value=requester_name, inline=True)
+            embed.add_field(name="Status", value="Pending", inline=True)
+            embed.add_field(name="Created at", value=f"<t:{get_timestamp(request['created_at'])}:f>", inline=True)
+            return embed
+
+        if status == 'accepted':
+            embed = discord.Embed(
+                title=f"☕ Coffee Chat Request: {request['topic']}",
+                description=request['description'],
+                color=discord.Color.green()
+            )
+            embed.add_field(name="Requested by", value=requester_name, inline=True)
+            embed.add_field(name="Accepted by", value=responder_name, inline=True)
+            embed.add_field(name="Status", value="In Progress", inline=True)
+            embed.add_field(name="Created at", value=f"<t:{get_timestamp(request['created_at'])}:f>", inline=True)
+            embed.add_field(name="Accepted at", value=f"<t:{get_timestamp(request['accepted_at'])}:f>", inline=True)
+            return embed
+
+        if status == 'completed':
+            # Calculate duration in minutes
+            duration = request['duration'] or 0
+
+            embed = discord.Embed(
+                title=f"☕ Coffee Chat Request: {request['topic']}",
+                description=request['description'],
+                color=discord.Color.purple()
+            )
+            embed.add_field(name="Requested by", value=requester_name, inline=True)
+            embed.add_field(name="Accepted by", value=responder_name, inline=True)
+            embed.add_field(name="Duration", value=f"{duration} minutes", inline=True)
+            embed.add_field(name="Status", value="Completed", inline=True)
+            embed.add_field(name="Created at", value=f"<t:{get_timestamp(request['created_at'])}:f>", inline=True)
+            embed.add_field(name="Completed at", value=f"<t:{get_timestamp(request['completed_at'])}:f>", inline=True)
+            return embed
+
+        if status == 'cancelled':
+            embed = discord.Embed(
+                title=f"☕ Coffee Chat Request: {request['topic']}",
+                description=request['description'],
+                color=discord.Color.red()
+            )
+            embed.add_field(name="Requested by", value=requester_name, inline=True)
+            embed.add_field(name="Status", value="Cancelled", inline=True)
+            embed.add_field(name="Created at", value=f"<t:{get_timestamp(request['created_at'])}:f>", inline=True)
+            embed.add_field(name="Cancelled at", value=f"<t:{get_timestamp(request['cancelled_at'])}:f>", inline=True)
+            return embed
+
+        return None
+
+    async def update(self, request, embed=None):
+        """Schedule an edit of a request's message to show its current status.
+
+        Pass an embed already rendered from the request to use names that may
+        no longer be cached by the time the edit is scheduled.
+        """
+        embed = embed or self.render(request)
+        if embed is None:
+            return False
+
+        accept_request_id = request['request_id'] if request['status'] == 'pending' else None
+        return await self.edit(request['channel_id'], request['message_id'], embed, accept_request_id)
+
+    async def edit(self, channel_id, message_id, embed, accept_request_id=None):
+        """Schedule a message to show an embed, replacing any edit still waiting.
+
+        The message only gets an accept button if accept_request_id is given.
+        Returns False if the message is missing or known to be deleted.
+        """
+        if not channel_id or not message_id:
+            return False
+
+        message_id = int(message_id)
+        if message_id in self.dead_messages:
+            self.skipped += 1
+            return False
+
+        await self.debouncer.schedule(int(channel_id), message_id, embed.to_dict(), accept_request_id)
+        return True
+
+    async def _apply_edit(self, edit):
+        """Edit a message by ID without fetching it."""
+        if edit.message_id in self.dead_messages:
+            self.skipped += 1
+            return
+
+        view = create_accept_view(edit.accept_request_id) if edit.accept_request_id else None
+        message = self.bot.get_partial_messageable(edit.channel_id).get_partial_message(edit.message_id)
+        try:
+            await self.bot.scheduler.edit(message, embed=discord.Embed.from_dict(edit.embed), view=view)
+            if view:
+                # Clicks are handled by the registered AcceptRequestButton
+                view.stop()
+        except discord.NotFound:
+            # Deleted messages stay deleted, so don't try them again
+            self.dead_messages.put(edit.message_id, True)
+            return
+        except (discord.Forbidden, discord.HTTPException) as e:
+            logger.error(f"Error editing request message {edit.message_id}: {e}")
+            return
+
+        self.edits += 1
+
+    async def restore(self):
+        """Apply the edits still pending when the bot last stopped."""
+        return await self.debouncer.restore()
+
+    async def close(self):
+        """Stop waiting edits, leaving them stored for the next start."""
+        await self.debouncer.close()
+
+    def get_metrics(self):
+        """Return edit counters, the size of the deleted message cache and debouncer counters."""
+        return {
+            'edits': self.edits,
+            'skipped': self.skipped,
+            'dead_messages': len(self.dead_messages),
+            'debouncer': self.debouncer.get_metrics()
+        }
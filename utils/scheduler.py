@@ -0,0 +1,279 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from enum import IntEnum
+
+from database.metrics import WaitStats
+
+logger = logging.getLogger('coffee_bot.scheduler')
+
+# Requests per second allowed across the whole bot
+OUTBOUND_GLOBAL_RATE = float(os.getenv('OUTBOUND_GLOBAL_RATE', '50'))
+# Share of the global bucket kept free for relays and chat lifecycle messages
+OUTBOUND_LOW_PRIORITY_RESERVE = float(os.getenv('OUTBOUND_LOW_PRIORITY_RESERVE', '0.2'))
+# Most edits and presence changes kept waiting before the oldest are shed
+OUTBOUND_MAX_DEFERRED = int(os.getenv('OUTBOUND_MAX_DEFERRED', '500'))
+
+# (requests, per seconds) for each kind of route
+ROUTE_LIMITS = {
+    'channel': (5, 5.0),
+    'presence': (5, 60.0)
+}
+
+class Priority(IntEnum):
+    """Outbound call classes, most urgent first."""
+    RELAY = 0  # Messages relayed between chat partners
+    LIFECYCLE = 1  # Chat welcome and end messages, request posts
+    EDIT = 2  # Cosmetic request message edits
+    PRESENCE = 3  # Bot status changes
+
+class TokenBucket:
+    """Local accounting for a rate limit of `capacity` requests per `per` seconds."""
+
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+
+    def __init__(self, capacity, per):
+        self.capacity = capacity
+        self.rate = capacity / per
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, tokens=1):
+        """Seconds until the bucket holds `tokens` tokens."""
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+    @property
+    def full(self):
+        return self.tokens >= self.capacity
+
+class Job:
+    __slots__ = ('priority', 'route', 'func', 'args', 'kwargs', 'coalesce_key', 'future', 'enqueued_at')
+
+    def __init__(self, priority, route, func, args, kwargs, coalesce_key, future):
+        self.priority = priority
+        self.route = route
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.coalesce_key = coalesce_key
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+def channel_route(destination):
+    """Get the rate-limit route for sending to or editing in a destination."""
+    # Contexts and messages are routed by their channel
+    channel = getattr(destination, 'channel', destination)
+    return f"channel:{channel.id}"
+
+class OutboundScheduler:
+    """Runs every outbound Discord call in priority order within rate limits.
+
+    Calls wait in one queue per priority class and are started when both the
+    global bucket and their route's bucket have a token, most urgent first,
+    so a relay is never stuck behind a cosmetic edit. Edits and presence
+    changes only run while the global bucket is above a reserve kept for
+    relays and lifecycle messages. Queued calls with the same coalesce key
+    replace each other, and the oldest deferred calls are shed once too many
+    are waiting. Superseded and shed calls resolve to None.
+    """
+
+    def __init__(self, global_rate=OUTBOUND_GLOBAL_RATE, reserve=OUTBOUND_LOW_PRIORITY_RESERVE,
+                 max_deferred=OUTBOUND_MAX_DEFERRED, route_limits=ROUTE_LIMITS):
+        self.global_bucket = TokenBucket(global_rate, 1.0)
+        self.reserve_tokens = global_rate * reserve
+        self.max_deferred = max_deferred
+        self.route_limits = route_limits
+        self.completed = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.shed = 0
+        self.queue_wait = {priority: WaitStats() for priority in Priority}
+        self._queues = {priority: deque() for priority in Priority}
+        self._coalescing = {}  # {coalesce_key: queued Job}
+        self._routes = {}  # {route: TokenBucket}
+        self._wakeup = asyncio.Event()
+        self._running = set()
+        self._task = None
+
+    def submit(self, priority, route, func, *args, coalesce_key=None, **kwargs):
+        """Queue func(*args, **kwargs) and return a future for its result."""
+        future = asyncio.get_running_loop().create_future()
+        job = Job(priority, route, func, args, kwargs, coalesce_key, future)
+
+        if coalesce_key is not None:
+            previous = self._coalescing.get(coalesce_key)
+            if previous is not None and not previous.future.done():
+                # The newer call makes the queued one redundant
+                self._queues[previous.priority].remove(previous)
+                previous.future.set_result(None)
+                self.coalesced += 1
+            self._coalescing[coalesce_key] = job
+
+        self._queues[priority].append(job)
+        if priority >= Priority.EDIT:
+            self._shed_deferred()
+
+        self._wakeup.set()
+        return future
+
+    async def send(self, destination, priority=Priority.LIFECYCLE, **kwargs):
+        """Send a message to a channel, user or context."""
+        return await self.submit(priority, channel_route(destination), destination.send, **kwargs)
+
+    async def edit(self, message, priority=Priority.EDIT, **kwargs):
+        """Edit a message, replacing any edit of it still waiting."""
+        return await self.submit(
+            priority, channel_route(message), message.edit,
+            coalesce_key=('edit', message.id), **kwargs
+        )
+
+    async def change_presence(self, bot, **kwargs):
+        """Change the bot's presence, replacing any change still waiting.
+
+        Returns True once the change is made, or None if it was shed or
+        replaced by a newer change.
+        """
+        async def apply(**kwargs):
+            await bot.change_presence(**kwargs)
+            return True
+
+        return await self.submit(
+            Priority.PRESENCE, 'presence', apply,
+            coalesce_key='presence', **kwargs
+        )
+
+    def _shed_deferred(self):
+        """Drop the oldest low-priority calls while too many are waiting."""
+        while sum(len(self._queues[p]) for p in (Priority.EDIT, Priority.PRESENCE)) > self.max_deferred:
+            queue = self._queues[Priority.PRESENCE] or self._queues[Priority.EDIT]
+            job = queue.popleft()
+            self._forget(job)
+            if not job.future.done():
+                job.future.set_result(None)
+            self.shed += 1
+
+    def _forget(self, job):
+        if job.coalesce_key is not None and self._coalescing.get(job.coalesce_key) is job:
+            del self._coalescing[job.coalesce_key]
+
+    def _route_bucket(self, route):
+        bucket = self._routes.get(route)
+        if bucket is None:
+            if len(self._routes) > 1000:
+                # Buckets that have refilled hold no state worth keeping
+                now = time.monotonic()
+                for key, idle in list(self._routes.items()):
+                    idle.refill(now)
+                    if idle.full:
+                        del self._routes[key]
+            capacity, per = self.route_limits.get(route.split(':', 1)[0], ROUTE_LIMITS['channel'])
+            bucket = self._routes[route] = TokenBucket(capacity, per)
+        return bucket
+
+    def _next_job(self):
+        """Pop the most urgent job that may run now.
+
+        Returns (job, None), or (None, seconds until a queued job could run).
+        """
+        now = time.monotonic()
+        self.global_bucket.refill(now)
+        wait = None
+
+        for priority, queue in self._queues.items():
+            # Low-priority work leaves the reserve for relays and lifecycle messages
+            needed = 1 + (self.reserve_tokens if priority >= Priority.EDIT else 0)
+
+            for job in list(queue):
+                if job.future.done():
+                    # Cancelled by the caller before it ran
+                    queue.remove(job)
+                    self._forget(job)
+                    continue
+
+                bucket = self._route_bucket(job.route)
+                bucket.refill(now)
+                if self.global_bucket.tokens >= needed and bucket.tokens >= 1:
+                    queue.remove(job)
+                    self._forget(job)
+                    self.global_bucket.tokens -= 1
+                    bucket.tokens -= 1
+                    return job, None
+
+                job_wait = max(self.global_bucket.wait_time(needed), bucket.wait_time())
+                wait = job_wait if wait is None else min(wait, job_wait)
+
+        return None, wait
+
+    async def _dispatch_loop(self):
+        """Background task that starts queued calls as tokens allow."""
+        while True:
+            job, wait = self._next_job()
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self.queue_wait[job.priority].record(time.monotonic() - job.enqueued_at)
+            task = asyncio.create_task(self._run(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, job):
+        try:
+            result = await job.func(*job.args, **job.kwargs)
+        except Exception as e:
+            self.failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            self.completed += 1
+            if not job.future.done():
+                job.future.set_result(result)
+
+    def start(self):
+        """Start the dispatch task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._dispatch_loop())
+
+    async def stop(self):
+        """Stop the dispatch task, waiting for calls already started."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+        for queue in self._queues.values():
+            while queue:
+                job = queue.popleft()
+                if not job.future.done():
+                    job.future.cancel()
+        self._coalescing.clear()
+
+    def get_metrics(self):
+        """Return queue depths, counters and queue wait times per priority."""
+        return {
+            'queued': {priority.name.lower(): len(queue) for priority, queue in self._queues.items()},
+            'running': len(self._running),
+            'global_tokens': round(self.global_bucket.tokens, 2),
+            'routes': len(self._routes),
+            'completed': self.completed,
+            'failed': self.failed,
+            'coalesced': self.coalesced,
+            'shed': self.shed,
+            'queue_wait': {priority.name.lower(): stats.snapshot() for priority, stats in self.queue_wait.items()}
+        }
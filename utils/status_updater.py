@@ -1,46 +1,112 @@
 import discord
 import logging
 import asyncio
-from database.db_operations import get_pending_requests
+import os
+import time
+from database.db_operations import get_pending_request_count
 
 logger = logging.getLogger('coffee_bot.status_updater')
 
+# Seconds to wait after a request event for more events before updating the status
+STATUS_DEBOUNCE = float(os.getenv('STATUS_DEBOUNCE', '3'))
+# Fewest seconds between presence changes (the gateway allows 5 per 60 seconds)
+STATUS_MIN_INTERVAL = float(os.getenv('STATUS_MIN_INTERVAL', '15'))
+
 class StatusUpdater:
-    """Class to manage the bot's status based on available coffee chat requests."""
+    """Class to manage the bot's status based on available coffee chat requests.
+    
+    Request lifecycle events call notify(), which updates the status once
+    events stop arriving for a moment. The presence is only changed when its
+    text differs from the last one sent, and never more often than the
+    minimum interval. The periodic loop just reconciles the status with the
+    pending request count in case an event was missed.
+    """
     
-    def __init__(self, bot):
+    def __init__(self, bot, debounce=STATUS_DEBOUNCE, min_interval=STATUS_MIN_INTERVAL):
         self.bot = bot
-        self.update_interval = 300  # Update every 5 minutes by default
+        self.update_interval = 300  # Reconcile every 5 minutes by default
+        self.debounce = debounce
+        self.min_interval = min_interval
         self.task = None
+        self.last_status_text = None
+        self.last_sent_at = None
+        self.events = 0
+        self.presence_changes = 0
+        self.unchanged_skips = 0
+        self._pending_update = None
+    
+    def get_status_text(self, request_count):
+        """Get the status text for a number of pending requests."""
+        if request_count == 0:
+            return "/coffee | No active requests"
+        elif request_count == 1:
+            return f"/coffee | 1 coffee chat available"
+        else:
+            return f"/coffee | {request_count} coffee chats available"
+    
+    def notify(self):
+        """Record a request event, updating the status once events settle."""
+        self.events += 1
+        if self._pending_update is None or self._pending_update.done():
+            self._pending_update = asyncio.create_task(self._debounced_update())
+    
+    async def _debounced_update(self):
+        """Wait out the debounce and the minimum interval, then update the status."""
+        try:
+            delay = self.debounce
+            if self.last_sent_at is not None:
+                delay = max(delay, self.last_sent_at + self.min_interval - time.monotonic())
+            await asyncio.sleep(delay)
+        finally:
+            # Events from now on need another update
+            self._pending_update = None
+        
+        await self.update_status()
     
     async def update_status(self):
-        """Update the bot's status to show the number of available coffee chat requests."""
+        """Update the bot's status to show the number of available coffee chat requests.
+        
+        Does nothing if the status text hasn't changed. Returns True if the
+        presence was changed.
+        """
         try:
-            # Get all pending requests
-            requests = await get_pending_requests()
-            request_count = len(requests)
+            # Get the number of pending requests
+            request_count = await get_pending_request_count()
+            status_text = self.get_status_text(request_count)
+            
+            if status_text == self.last_status_text:
+                self.unchanged_skips += 1
+                return False
             
-            # Create appropriate status message
-            if request_count == 0:
-                status_text = "/coffee | No active requests"
-            elif request_count == 1:
-                status_text = f"/coffee | 1 coffee chat available"
-            else:
-                status_text = f"/coffee | {request_count} coffee chats available"
+            if self.last_sent_at is not None and time.monotonic() - self.last_sent_at < self.min_interval:
+                # Too soon after the last change; a debounced update will catch up
+                self.notify()
+                return False
             
             # Set the bot's activity
             activity = discord.Activity(
                 type=discord.ActivityType.listening,
                 name=status_text
             )
-            await self.bot.change_presence(status=discord.Status.online, activity=activity)
-            logger.info(f"Updated bot status: {status_text}")
+            changed = await self.bot.scheduler.change_presence(self.bot, status=discord.Status.online, activity=activity)
+            if not changed:
+                # Shed or replaced by a newer change, so this text isn't showing
+                return False
             
+            self.last_status_text = status_text
+            self.last_sent_at = time.monotonic()
+            self.presence_changes += 1
+            logger.info(f"Updated bot status: {status_text}")
+            return True
+        
         except Exception as e:
+            # Let the next update try this text again
+            self.last_status_text = None
             logger.error(f"Error updating bot status: {e}")
+            return False
     
     async def start_status_updates(self):
-        """Start the periodic status update task."""
+        """Start the periodic status reconciliation task."""
         if self.task is not None:
             self.task.cancel()
         
@@ -48,7 +114,7 @@ class StatusUpdater:
         logger.info("Started status update task")
     
     async def _status_update_loop(self):
-        """Background task to periodically update the bot's status."""
+        """Background task to periodically reconcile the bot's status."""
         try:
             while True:
                 await self.update_status()
@@ -64,3 +130,16 @@ class StatusUpdater:
             self.task.cancel()
             self.task = None
             logger.info("Stopped status update task")
+        
+        if self._pending_update is not None:
+            self._pending_update.cancel()
+            self._pending_update = None
+    
+    def get_metrics(self):
+        """Return event, presence change and skipped update counts."""
+        return {
+            'events': self.events,
+            'presence_changes': self.presence_changes,
+            'unchanged_skips': self.unchanged_skips,
+            'last_status_text': self.last_status_text
+        }
@@ -24,8 +24,8 @@ class CoffeeChatRequestModal(ui.Modal, title="Coffee Chat Request"):
         max_length=1000
     )
     
-    def __init__(self, callback):
-        super().__init__()
+    def __init__(self, callback, title="Coffee Chat Request"):
+        super().__init__(title=title)
         self.callback_func = callback
     
     async def on_submit(self, interaction: discord.Interaction):
@@ -73,20 +73,76 @@ class CoffeeChatView(ui.View):
         await self.cancel_callback(interaction)
 
 class RequestListView(ui.View):
-    """View for displaying a list of chat requests."""
+    """View for browsing chat requests one page at a time."""
     
-    def __init__(self, requests, accept_callback):
+    def __init__(self, page, fetch_page, accept_callback, total_count=None):
         super().__init__(timeout=300)  # 5 minute timeout
-        self.requests = requests
+        self.page = page
+        self.fetch_page = fetch_page
         self.accept_callback = accept_callback
+        self.total_count = total_count
+        self.page_number = 1
+        self.select = None
+        
+        self.update_items()
+    
+    @property
+    def requests(self):
+        return self.page['requests']
+    
+    def update_items(self):
+        """Show the select menu for the current page and enable the page buttons."""
+        if self.select:
+            self.remove_item(self.select)
+            self.select = None
         
         # Add a select menu if there are requests
-        if requests:
+        if self.requests:
             self.add_request_select()
+        
+        self.previous_button.disabled = not self.page['has_previous']
+        self.next_button.disabled = not self.page['has_next']
     
     def add_request_select(self):
-        select = RequestSelect(self.requests, self.accept_callback)
-        self.add_item(select)
+        self.select = RequestSelect(self.requests, self.accept_callback)
+        self.select.row = 0  # Keep the select above the page buttons
+        self.add_item(self.select)
+    
+    def create_embed(self):
+        """Create the embed describing the current page."""
+        count = self.total_count if self.total_count is not None else len(self.requests)
+        embed = discord.Embed(
+            title=f"Coffee Chat Requests ({count})",
+            description="Select a request to accept:",
+            color=discord.Color.blue()
+        )
+        embed.set_footer(text=f"Page {self.page_number}")
+        return embed
+    
+    async def show_page(self, interaction, page, page_number):
+        if page['requests']:
+            self.page = page
+            self.page_number = page_number
+        elif page_number > self.page_number:
+            # Everything past this page was accepted or cancelled meanwhile
+            self.page['has_next'] = False
+        else:
+            self.page['has_previous'] = False
+        
+        self.update_items()
+        await interaction.response.edit_message(embed=self.create_embed(), view=self)
+    
+    @ui.button(label="Previous", style=discord.ButtonStyle.secondary, emoji="⬅️", row=1)
+    async def previous_button(self, interaction: discord.Interaction, button: ui.Button):
+        first = self.requests[0]
+        page = await self.fetch_page(before=(first['created_at'], first['request_id']))
+        await self.show_page(interaction, page, max(1, self.page_number - 1))
+    
+    @ui.button(label="Next", style=discord.ButtonStyle.secondary, emoji="➡️", row=1)
+    async def next_button(self, interaction: discord.Interaction, button: ui.Button):
+        last = self.requests[-1]
+        page = await self.fetch_page(after=(last['created_at'], last['request_id']))
+        await self.show_page(interaction, page, self.page_number + 1)
 
 class RequestSelect(ui.Select):
     """Select menu for chat requests."""
@@ -159,6 +215,47 @@ class ChatView(ui.View):
     async def end_chat_button(self, interaction: discord.Interaction, button: ui.Button):
         await self.end_callback(interaction)
 
+class AcceptRequestButton(ui.DynamicItem[ui.Button], template=r'accept_request[:_](?P<id>[0-9]+)'):
+    """Accept button on a request message.
+    
+    A single handler registered with bot.add_dynamic_items serves the
+    buttons of every request message, including ones posted before a
+    restart, by reading the request ID from the custom ID when clicked.
+    """
+    
+    def __init__(self, request_id):
+        super().__init__(
+            ui.Button(
+                label="Accept Request",
+                style=discord.ButtonStyle.success,
+                emoji="✅",
+                custom_id=f"accept_request:{request_id}"
+            )
+        )
+        self.request_id = request_id
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match['id']))
+    
+    async def callback(self, interaction: discord.Interaction):
+        commands_cog = interaction.client.get_cog('CoffeeCommands')
+        if commands_cog is None:
+            await interaction.response.send_message("Coffee chats are unavailable right now.", ephemeral=True)
+            return
+        
+        await commands_cog.handle_accept_request(interaction, self.request_id)
+
+def create_accept_view(request_id):
+    """Create a view holding the accept button for a request.
+    
+    Stop the view once it has been sent so it isn't kept in the view store;
+    clicks are handled by the registered AcceptRequestButton instead.
+    """
+    view = ui.View(timeout=None)
+    view.add_item(AcceptRequestButton(request_id))
+    return view
+
 def create_request_embed(request, user):
     """Create an embed for a chat request."""
     # Get the timestamp from the request or use current time as fallback
@@ -229,7 +326,7 @@ def create_completed_request_embed(request_id, chat_data, responder_name):
     
     return embed
 
-def create_stats_embed(user, stats):
+def create_stats_embed(user, stats, rank=None):
     """Create an embed for user stats."""
     embed = discord.Embed(
         title=f"Coffee Chat Stats for {user.display_name}",
@@ -239,14 +336,18 @@ def create_stats_embed(user, stats):
     embed.add_field(name="Total Chats", value=stats['total_chats'], inline=True)
     embed.add_field(name="Total Chat Time", value=f"{stats['total_time']} minutes", inline=True)
     
+    # rank is (position, ranked users) when the user has completed a chat
+    if rank:
+        embed.add_field(name="Leaderboard Rank", value=f"#{rank[0]} of {rank[1]}", inline=True)
+    
     embed.set_thumbnail(url=user.display_avatar.url)
     embed.set_footer(text=f"User ID: {user.id}")
     embed.timestamp = discord.utils.utcnow()
     
     return embed
 
-def create_leaderboard_embed(leaderboard):
-    """Create an embed for the leaderboard."""
+def create_leaderboard_embed(leaderboard, server_leaderboard=None, server_name=None):
+    """Create an embed for the leaderboard, optionally with a server's top users."""
     embed = discord.Embed(
         title="☕ Coffee Chat Leaderboard ☕",
         description="Top users by number of completed coffee chats",
@@ -263,6 +364,13 @@ def create_leaderboard_embed(leaderboard):
         value = f"Chats: {entry['total_chats']} | Time: {entry['total_time']} min"
         embed.add_field(name=name, value=value, inline=False)
     
+    if server_leaderboard:
+        lines = [
+            f"{i}. {entry['username']} ({entry['total_chats']} chats, {entry['total_time']} min)"
+            for i, entry in enumerate(server_leaderboard, 1)
+        ]
+        embed.add_field(name=f"Top in {server_name}", value="\n".join(lines), inline=False)
+    
     embed.set_footer(text="Start a coffee chat to join the leaderboard!")
     embed.timestamp = discord.utils.utcnow()
     